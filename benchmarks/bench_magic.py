@@ -0,0 +1,43 @@
+"""Rough timings of the magic Op evaluation paths, run with `PYTHONPATH=. python benchmarks/bench_magic.py`"""
+import timeit
+from dataclasses import dataclass
+
+from dexpr.magic import ParameterOp, calc, calc_batch, compile, lazy
+
+_0 = ParameterOp(_index=0)
+_1 = ParameterOp(_index=1)
+
+
+@dataclass
+class Order:
+    price: float
+    qty: int
+
+
+def bench_compile(number=100_000):
+    expr = (_0.price * _0.qty + lazy(abs)(_1 - 10) * 2) / (_0.qty + 1) < 100
+    compiled = compile(expr)
+    args = (Order(12.5, 3), 7)
+    assert calc(expr, *args) == compiled(*args)
+
+    interpreted = timeit.timeit(lambda: calc(expr, *args), number=number)
+    lowered = timeit.timeit(lambda: compiled(*args), number=number)
+    print(f'calc:    {interpreted:.3f}s for {number} calls')
+    print(f'compile: {lowered:.3f}s for {number} calls ({interpreted / lowered:.1f}x)')
+
+
+def bench_batch(rows=100_000):
+    import numpy as np
+
+    expr = 0 < _0 * _1 * 1.1 - 5 <= 100
+    price, qty = np.random.uniform(1, 20, rows), np.random.randint(1, 10, rows)
+
+    interpreted = timeit.timeit(lambda: [calc(expr, p, q) for p, q in zip(price.tolist(), qty.tolist())], number=1)
+    vectorized = timeit.timeit(lambda: calc_batch(expr, [price, qty]), number=1)
+    print(f'calc per row: {interpreted:.3f}s for {rows} rows')
+    print(f'calc_batch:   {vectorized:.3f}s for {rows} rows ({interpreted / vectorized:.1f}x)')
+
+
+if __name__ == '__main__':
+    bench_compile()
+    bench_batch()
@@ -1,13 +1,24 @@
+from bisect import bisect_right
+from collections.abc import Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import date, timedelta
 from itertools import islice
 from typing import cast
 
-from dexpr.calendar import Calendar
-from dexpr.magic import Item, const, Op
+from dexpr.calendar import Calendar, WeekendCalendar
+from dexpr.magic import Item, const, Op, mark_compared, pop_compared, is_compared
 from dexpr.tenor import Tenor
 
+try:
+    import numpy as np
+except ImportError:  # numpy is only required by DGen.to_numpy
+    np = None
+
 __all__ = ('is_dgen', 'make_date', 'make_dgen', 'years', 'months', 'weeks', 'weekdays', 'weekends', 'days',
-           'business_days', 'roll_fwd', 'roll_bwd')
+           'business_days', 'roll_fwd', 'roll_bwd', 'as_of')
+
+_as_of: ContextVar = ContextVar('_as_of', default=None)
 
 
 def is_dgen(obj):
@@ -43,15 +54,530 @@ def is_negative_slice(item):
         or item.step is not None and item.step < 0
 
 
+class DGenView(Sequence):
+    """The dates a DGen generates between two bounds as a read-only sorted sequence, see DGen.view"""
+
+    def _at(self, i):
+        raise NotImplementedError
+
+    def __getitem__(self, item):
+        n = len(self)
+        if isinstance(item, slice):
+            return _SlicedView(self, range(n)[item])
+        if item < 0:
+            item += n
+        if not 0 <= item < n:
+            raise IndexError('date view index out of range')
+        return self._at(item)
+
+    def __iter__(self):
+        return (self._at(i) for i in range(len(self)))
+
+    def _bisect_left(self, d):
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._at(mid) < d:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _bisect_right(self, d):
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._at(mid) <= d:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def count(self, d):
+        d = make_date(d)
+        return self._bisect_right(d) - self._bisect_left(d)
+
+    def index(self, d):
+        d = make_date(d)
+        if (i := self._bisect_left(d)) < len(self) and self._at(i) == d:
+            return i
+        raise ValueError(f'{d} is not in the date view')
+
+    def __contains__(self, d):
+        return self.count(d) > 0
+
+    def _seek(self, d):
+        # the first date on or after d
+        return self._at(i) if (i := self._bisect_left(d)) < len(self) else None
+
+    def _seek_back(self, d):
+        # the last date on or before d
+        return self._at(i - 1) if (i := self._bisect_right(d)) else None
+
+
+def _range_bisect(r, x):
+    # the number of items of the ascending range r that are below x
+    return min(len(r), max(0, -(-(x - r.start) // r.step)))
+
+
+class _SlicedView(DGenView):
+    def __init__(self, view, indices):
+        self._view = view
+        self._indices = indices
+
+    def __len__(self):
+        return len(self._indices)
+
+    def _at(self, i):
+        return self._view._at(self._indices[i])
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return _SlicedView(self._view, self._indices[item])
+        return super().__getitem__(item)
+
+    def _bisect_left(self, d):
+        if self._indices.step < 0:
+            return super()._bisect_left(d)
+        return _range_bisect(self._indices, self._view._bisect_left(d))
+
+    def _bisect_right(self, d):
+        if self._indices.step < 0:
+            return super()._bisect_right(d)
+        return _range_bisect(self._indices, self._view._bisect_right(d))
+
+    def count(self, d):
+        d = make_date(d)
+        indices = self._indices if self._indices.step > 0 else self._indices[::-1]
+        return _range_bisect(indices, self._view._bisect_right(d)) - _range_bisect(indices, self._view._bisect_left(d))
+
+    def index(self, d):
+        if self._indices.step > 0:
+            return super().index(d)
+        d = make_date(d)
+        indices = self._indices[::-1]
+        i = _range_bisect(indices, self._view._bisect_right(d)) - 1
+        if i >= 0 and indices[i] >= self._view._bisect_left(d):
+            return len(indices) - 1 - i
+        raise ValueError(f'{d} is not in the date view')
+
+
+class _CadenceView(DGenView):
+    # the dates numbered by `indices`, `to_date` maps a number to its date and `ceil` a date to the number of the
+    # first date on or after it
+    def __init__(self, indices, to_date, ceil):
+        self._indices = indices
+        self._to_date = to_date
+        self._ceil = ceil
+
+    def __len__(self):
+        return len(self._indices)
+
+    def _at(self, i):
+        return self._to_date(self._indices[i])
+
+    def _bisect_left(self, d):
+        return _range_bisect(self._indices, self._ceil(d))
+
+    def _bisect_right(self, d):
+        k = self._ceil(d)
+        try:
+            if self._to_date(k) == d:
+                k += 1
+        except (ValueError, OverflowError):
+            pass
+        return _range_bisect(self._indices, k)
+
+
+class _ShiftView(DGenView):
+    def __init__(self, view, shift):
+        self._view = view
+        self._shift = shift
+
+    def __len__(self):
+        return len(self._view)
+
+    def _at(self, i):
+        return self._shift(self._view._at(i))
+
+
+class _GroupedView(DGenView):
+    # concatenates the dates `group` produces for each period; periods ending by `before` are known to hold
+    # exactly `length` dates each, the periods after those are produced as far as an index needs them
+    def __init__(self, periods, group, length, cadence, before):
+        self._periods = periods
+        self._group = group
+        self._length = length
+
+        n = periods._bisect_left(before)
+        full = 0
+        if length is not None:
+            hi = n
+            while full < hi:
+                mid = (full + hi) // 2
+                if _period_end(cadence, periods._at(mid)) <= before:
+                    full = mid + 1
+                else:
+                    hi = mid
+        self._full = full
+        self._n = n
+
+        self._tail = []
+        self._offsets = []
+        self._end = full * (length or 0)  # the index following the dates produced so far
+
+    def _produce(self, i):
+        # produces the periods of the tail up to the one holding the date at index i
+        while self._end <= i and self._full + len(self._tail) < self._n:
+            view = self._group(self._periods._at(self._full + len(self._tail)))
+            self._tail.append(view)
+            self._offsets.append(self._end)
+            self._end += len(view)
+
+    def __len__(self):
+        self._produce(float('inf'))
+        return self._end
+
+    def __getitem__(self, item):
+        if isinstance(item, int) and item >= 0:
+            self._produce(item)
+            if item >= self._end:
+                raise IndexError('date view index out of range')
+            return self._at(item)
+        return super().__getitem__(item)
+
+    def _at(self, i):
+        if i < self._full * (self._length or 0):
+            q, r = divmod(i, self._length)
+            return self._group(self._periods._at(q))._at(r)
+        self._produce(i)
+        j = bisect_right(self._offsets, i) - 1
+        return self._tail[j]._at(i - self._offsets[j])
+
+
+class _IterView(DGenView):
+    # a view over a generator without a closed form, `dates` returns a fresh iterator and is only materialized
+    # when the length or a negative index is asked for
+    def __init__(self, dates):
+        self._dates = dates
+        self._cache = None
+
+    def _materialized(self):
+        if self._cache is None:
+            self._cache = tuple(self._dates())
+        return self._cache
+
+    def __len__(self):
+        return len(self._materialized())
+
+    def _at(self, i):
+        return self._materialized()[i]
+
+    def __getitem__(self, item):
+        if self._cache is None:
+            if isinstance(item, int) and item >= 0:
+                if (d := next(islice(self._dates(), item, None), None)) is None:
+                    raise IndexError('date view index out of range')
+                return d
+            if isinstance(item, slice) and not is_negative_slice(item):
+                return _IterView(lambda: islice(self._dates(), item.start, item.stop, item.step))
+        return super().__getitem__(item)
+
+    def __iter__(self):
+        return iter(self._cache) if self._cache is not None else self._dates()
+
+
+def _view_of(gen, start, end, after, before, calendar):
+    if (view := gen.__view__(start, end, after, before, calendar)) is None:
+        view = _IterView(lambda: gen.__invoke__(start, end, after, before, calendar))
+    return view
+
+
+def _seek_after(gen, d, bounds):
+    return gen.__seek__(d + timedelta(days=1), *bounds) if d < date.max else None
+
+
+def _seek_before(gen, d, bounds):
+    return gen.__seek_back__(d - timedelta(days=1), *bounds) if d > date.min else None
+
+
+def _seek_mapped(gen, shift, d, estimate, bounds):
+    # the first date on or after d of gen's dates passed through the non-decreasing shift, estimate approximates
+    # the date that shifts onto d
+    x = gen.__seek__(estimate, *bounds)
+    while x is not None and shift(x) < d:
+        x = _seek_after(gen, x, bounds)
+    while (p := _seek_before(gen, estimate if x is None else x, bounds)) is not None and shift(p) >= d:
+        x = p
+    return None if x is None else shift(x)
+
+
+def _seek_back_mapped(gen, shift, d, estimate, bounds):
+    x = gen.__seek_back__(estimate, *bounds)
+    while x is not None and shift(x) > d:
+        x = _seek_before(gen, x, bounds)
+    while (n := _seek_after(gen, estimate if x is None else x, bounds)) is not None and shift(n) <= d:
+        x = n
+    return None if x is None else shift(x)
+
+
+def _seek_filtered(gen, keep, d, bounds):
+    x = gen.__seek__(d, *bounds)
+    while x is not None and not keep(x):
+        x = _seek_after(gen, x, bounds)
+    return x
+
+
+def _seek_back_filtered(gen, keep, d, bounds):
+    x = gen.__seek_back__(d, *bounds)
+    while x is not None and not keep(x):
+        x = _seek_before(gen, x, bounds)
+    return x
+
+
+def _shifted(shift, d, limit):
+    # a limit moved by a tenor, open limits and limits moved past the supported dates stay open
+    if d == limit:
+        return d
+    try:
+        return shift(d)
+    except (ValueError, OverflowError):
+        return limit
+
+
+def _period_end(cadence, begin):
+    # the end of the period beginning at begin, date.max when it runs past the supported dates
+    return _shifted(cadence.add_to, begin, date.max)
+
+
+def _bound_sensitive(gen):
+    # whether generating gen within tighter bounds could change its dates inside those bounds: slices count from
+    # the first date generated, negative sub sequence slices from the last, and rolls and negative or business
+    # day tenors move dates from outside the bounds inside them
+    if isinstance(gen, (SliceDGen, RollFwdDGen, RollBwdDGen)):
+        return True
+    if isinstance(gen, SubSequenceDGen) and gen.slice is not None and is_negative_slice(gen.slice):
+        return True
+    if isinstance(gen, (AddTenorDGen, SubTenorDGen)) and (gen.tenor.is_neg() or gen.tenor.ymwd_b[-1]):
+        return True
+    return any(_bound_sensitive(g) for g in (getattr(gen, name, None) for name in ('gen', 'gen1', 'gen2', 'main_sequence'))
+               if is_dgen(g))
+
+
+def _narrowed(gen, after, before, limits):
+    # the bounds to generate gen within when only its dates within the limits are used
+    if _bound_sensitive(gen):
+        return after, before
+    lo, hi = limits
+    if lo > after:
+        after = lo
+    if hi < date.max and hi + timedelta(days=1) < before:
+        before = hi + timedelta(days=1)
+    return after, before
+
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _to_array(dates):
+    return np.array(list(dates), dtype='datetime64[D]')
+
+
+def _map_array(fn, days):
+    return _to_array(map(fn, days.tolist()))
+
+
+def _cadence_array(view, unit, scale=1, offset=0):
+    # the dates of a cadence view from its numbers, a day number is an ordinal, a month or year number counts from
+    # the year 0
+    k = np.arange(view._indices.start, view._indices.stop, dtype=np.int64) * scale + offset
+    if unit == 'D':
+        return (k - _EPOCH).astype('datetime64[D]')
+    epoch = 1970 * 12 if unit == 'M' else 1970
+    return (k - epoch).astype(f'datetime64[{unit}]').astype('datetime64[D]')
+
+
+def _weekdays(days):
+    return (days.astype(np.int64) + 3) % 7  # 1970-01-01 is a Thursday
+
+
+def _increasing(days):
+    return bool(np.all(days[1:] > days[:-1]))
+
+
+def _weekmask(calendar):
+    return [i not in calendar.weekend_days() for i in range(7)]
+
+
+def _business_days_array(calendar, days, n, backward):
+    # add_business_days (or sub_business_days when backward) over an array, numpy rolls and counts business days
+    # the same way WeekendCalendar does, other calendars are asked date by date
+    if type(calendar) is WeekendCalendar:
+        return np.busday_offset(days, -n if backward else n, roll='backward' if backward else 'forward',
+                                weekmask=_weekmask(calendar))
+    if backward:
+        return _map_array(lambda d: calendar.sub_business_days(d, n), days)
+    return _map_array(lambda d: calendar.add_business_days(d, n), days)
+
+
+def _tenor_array(tenor, days, calendar, subtract=False):
+    # Tenor.add_to (or sub_from) over an array
+    if tenor.is_neg():
+        return _tenor_array(-tenor, days, calendar, not subtract)
+    y, m, w, d, b = tenor.ymwd_b
+    if b:
+        if calendar is None:
+            raise ValueError(f'cannot {"subtract" if subtract else "add"} business days tenors without a calendar')
+        return _in_date_range(_business_days_array(calendar, days, b, subtract))
+    sign = -1 if subtract else 1
+    if y or m:
+        months = days.astype('datetime64[M]')
+        day = days - months.astype('datetime64[D]')
+        months = months + sign * (12 * y + m)
+        first = months.astype('datetime64[D]')
+        days = first + np.minimum(day, (months + 1).astype('datetime64[D]') - first - 1)
+    return _in_date_range(days + sign * (7 * w + d))
+
+
+def _in_date_range(days):
+    # datetime64 goes past date.min and date.max, where adding a tenor to a date raises
+    if len(days) and (days.min() < np.datetime64(date.min, 'D') or days.max() > np.datetime64(date.max, 'D')):
+        raise OverflowError('date value out of range')
+    return days
+
+
+def _day(k):
+    return date.fromordinal(k)
+
+
+def _day_ceil(d):
+    return d.toordinal()
+
+
+def _week(k):
+    return date.fromordinal(7 * k + 1)  # date.min is a Monday
+
+
+def _week_ceil(d):
+    return -(-(d.toordinal() - 1) // 7)
+
+
+def _month(k):
+    return date(k // 12, k % 12 + 1, 1)
+
+
+def _month_ceil(d):
+    return d.year * 12 + d.month - 1 + (d.day > 1)
+
+
+def _year(k):
+    return date(k, 1, 1)
+
+
+def _year_ceil(d):
+    return d.year + (d.month > 1 or d.day > 1)
+
+
+# the shortest and the longest period of a cadence in days
+_PERIOD_DAYS = {(0, 0, 1, 0, 0): (7, 7), (0, 1, 0, 0, 0): (28, 31), (1, 0, 0, 0, 0): (365, 366)}
+
+
+def _group_length(cadence, sub_sequence, item):
+    # the number of dates every period of a sub sequence holds, None when it varies from period to period
+    if cadence is None or (period := _PERIOD_DAYS.get(cadence.ymwd_b)) is None:
+        return None
+    if type(sub_sequence) is EveryDayDGen:
+        counts = period
+    elif type(sub_sequence) in (WeeksDGen, DayOfWeekDGen):
+        counts = period[0] // 7, -(-period[1] // 7)
+    elif type(sub_sequence) is MonthsDGen and period[0] == 365:
+        counts = 12, 12
+    else:
+        return None
+    lengths = {len(range(c)[item or slice(None)]) for c in range(counts[0], counts[1] + 1)}
+    return lengths.pop() if len(lengths) == 1 else None
+
+
 class DGen(Item):
     def __call__(self, input_date=None, start: date = date.min, end: date = date.max, after: date = date.min,
-                 before: date = date.max, calendar: Calendar = None):
-        return self.__invoke__(make_date(start), make_date(end), make_date(after), make_date(before), calendar)
+                 before: date = date.max, calendar: Calendar = None, descending: bool = False):
+        start, end, after, before = make_date(start), make_date(end), make_date(after), make_date(before)
+        if (anchor := _as_of.get()) is not None:
+            # the anchor bounds the side the dates are generated from when the call leaves it open
+            if not descending and start is date.min and after is date.min:
+                return AfterOrOnDGen(self, anchor).__invoke__(start, end, after, before, calendar)
+            if descending and end is date.max and before is date.max:
+                return BeforeOrOnDGen(self, anchor).__invoke_descending__(start, end, after, before, calendar)
+        invoke = self.__invoke_descending__ if descending else self.__invoke__
+        return invoke(start, end, after, before, calendar)
 
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         raise StopIteration
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        # the dates of __invoke__ latest first, generators that can walk backwards override it
+        if (view := self.__view__(start, end, after, before, calendar)) is not None:
+            yield from reversed(view)
+        else:
+            yield from reversed(list(self.__invoke__(start, end, after, before, calendar)))
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return None
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        # the dates of __invoke__ as a datetime64[D] array, generators that can compute them as arrays override it
+        return _to_array(self.__invoke__(start, end, after, before, calendar))
+
+    def to_numpy(self, after: date = date.min, before: date = date.max, calendar: Calendar = None):
+        """The dates generated between the bounds as a NumPy datetime64[D] array"""
+        if np is None:
+            raise ImportError('to_numpy requires numpy')
+        return self.__numpy__(date.min, date.max, make_date(after), make_date(before), calendar)
+
+    def view(self, after: date = date.min, before: date = date.max, calendar: Calendar = None) -> DGenView:
+        """The dates generated between the bounds as a sequence, computed arithmetically where the generator allows"""
+        return _view_of(self, date.min, date.max, make_date(after), make_date(before), calendar)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        # the first generated date on or after d, generators that can seek without generating override it
+        if (view := self.__view__(start, end, after, before, calendar)) is not None:
+            return view._seek(d)
+        return next((x for x in self.__invoke__(start, end, after, before, calendar) if x >= d), None)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        # the last generated date on or before d
+        if (view := self.__view__(start, end, after, before, calendar)) is not None:
+            return view._seek_back(d)
+        last = None
+        for x in self.__invoke__(start, end, after, before, calendar):
+            if x > d:
+                break
+            last = x
+        return last
+
+    def contains(self, d, after: date = date.min, before: date = date.max, calendar: Calendar = None) -> bool:
+        d = make_date(d)
+        return self.__seek__(d, date.min, date.max, make_date(after), make_date(before), calendar) == d
+
+    def next_after(self, d, after: date = date.min, before: date = date.max, calendar: Calendar = None,
+                   inclusive: bool = False):
+        """The first generated date after d (or on it when inclusive), None if there is none"""
+        bounds = date.min, date.max, make_date(after), make_date(before), calendar
+        d = make_date(d)
+        return self.__seek__(d, *bounds) if inclusive else _seek_after(self, d, bounds)
+
+    def prev_before(self, d, after: date = date.min, before: date = date.max, calendar: Calendar = None,
+                    inclusive: bool = False):
+        """The last generated date before d (or on it when inclusive), None if there is none"""
+        bounds = date.min, date.max, make_date(after), make_date(before), calendar
+        d = make_date(d)
+        return self.__seek_back__(d, *bounds) if inclusive else _seek_before(self, d, bounds)
+
+    def __limits__(self):
+        # the earliest and the latest date the generator can generate whatever the bounds it is called with
+        return date.min, date.max
+
     def is_single_date_gen(self):
         return False
 
@@ -85,9 +611,9 @@ class DGen(Item):
         if is_dgen(other) and self.is_single_date_gen():
             return other.__ge__(self)
         else:
-            if lhs := getattr(self, '__compared__', None):
+            if (lhs := pop_compared(self)) is not None:
                 return BeforeDGen(lhs, make_date(other))
-            if self.__expression__ is not None:
+            if self.__expression__ is not None and is_compared(self.__expression__):
                 return self.__expression__ < other
             return BeforeDGen(self, make_date(other))
 
@@ -103,9 +629,9 @@ class DGen(Item):
         if is_dgen(other) and self.is_single_date_gen():
             return other.__gt__(self)
         else:
-            if lhs := getattr(self, '__compared__', None):
+            if (lhs := pop_compared(self)) is not None:
                 return BeforeOrOnDGen(lhs, make_date(other))
-            if self.__expression__ is not None:
+            if self.__expression__ is not None and is_compared(self.__expression__):
                 return self.__expression__ <= other
             return BeforeOrOnDGen(self, make_date(other))
 
@@ -155,19 +681,49 @@ class ConstDGen(DGen):
     def is_single_date_gen(self):
         return True
 
+    def __limits__(self):
+        return self.date, self.date
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return _to_array((self.date,))
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         yield self.date
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        yield self.date
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return self.date if self.date >= d else None
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return self.date if self.date <= d else None
+
 
 class SequenceDGen(DGen):
     def __init__(self, dates):
         self.dates = dates
 
+    def __limits__(self):
+        return min(self.dates, default=date.max), max(self.dates, default=date.min)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return _to_array(self.dates)
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         yield from self.dates
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        yield from reversed(self.dates)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return min((x for x in self.dates if x >= d), default=None)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return max((x for x in self.dates if x <= d), default=None)
+
 
 class AfterDGen(DGen):
     def __init__(self, gen, date):
@@ -177,6 +733,12 @@ class AfterDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        lo, hi = self.gen.__limits__()
+        if is_dgen(self.date) or self.date == date.max:
+            return lo, hi
+        return max(lo, self.date + timedelta(days=1)), hi
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         if is_dgen(self.date):
@@ -188,10 +750,42 @@ class AfterDGen(DGen):
 
         yield from (d for d in self.gen.__invoke__(start, end, after, before, calendar) if d >= after)
 
-    def __bool__(self):
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
         if is_dgen(self.date):
-            self.date.__compared__ = self
-        self.gen.__compared__ = self
+            yield from super().__invoke_descending__(start, end, after, before, calendar)
+            return
+        after = self.date + timedelta(days=1)
+        yield from (d for d in self.gen.__invoke_descending__(start, end, after, before, calendar) if d >= after)
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return None
+        after = self.date + timedelta(days=1)
+        if (view := self.gen.__view__(start, end, after, before, calendar)) is not None:
+            return view[view._bisect_left(after):]
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__numpy__(start, end, after, before, calendar)
+        after = self.date + timedelta(days=1)
+        days = self.gen.__numpy__(start, end, after, before, calendar)
+        return days[days >= np.datetime64(after, 'D')]
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__seek__(d, start, end, after, before, calendar)
+        after = self.date + timedelta(days=1)
+        return self.gen.__seek__(max(d, after), start, end, after, before, calendar)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__seek_back__(d, start, end, after, before, calendar)
+        after = self.date + timedelta(days=1)
+        x = self.gen.__seek_back__(d, start, end, after, before, calendar)
+        return x if x is not None and x >= after else None
+
+    def __bool__(self):
+        mark_compared(self, self.gen, *((self.date,) if is_dgen(self.date) else ()))
         return True
 
 
@@ -203,6 +797,10 @@ class AfterOrOnDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        lo, hi = self.gen.__limits__()
+        return (lo, hi) if is_dgen(self.date) else (max(lo, self.date), hi)
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         if is_dgen(self.date):
@@ -212,10 +810,42 @@ class AfterOrOnDGen(DGen):
 
         yield from (d for d in self.gen.__invoke__(start, end, after, before, calendar) if d >= after)
 
-    def __bool__(self):
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            yield from super().__invoke_descending__(start, end, after, before, calendar)
+            return
+        after = self.date
+        yield from (d for d in self.gen.__invoke_descending__(start, end, after, before, calendar) if d >= after)
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
         if is_dgen(self.date):
-            self.date.__compared__ = self
-        self.gen.__compared__ = self
+            return None
+        after = self.date
+        if (view := self.gen.__view__(start, end, after, before, calendar)) is not None:
+            return view[view._bisect_left(after):]
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__numpy__(start, end, after, before, calendar)
+        after = self.date
+        days = self.gen.__numpy__(start, end, after, before, calendar)
+        return days[days >= np.datetime64(after, 'D')]
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__seek__(d, start, end, after, before, calendar)
+        after = self.date
+        return self.gen.__seek__(max(d, after), start, end, after, before, calendar)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__seek_back__(d, start, end, after, before, calendar)
+        after = self.date
+        x = self.gen.__seek_back__(d, start, end, after, before, calendar)
+        return x if x is not None and x >= after else None
+
+    def __bool__(self):
+        mark_compared(self, self.gen, *((self.date,) if is_dgen(self.date) else ()))
         return True
 
 
@@ -227,6 +857,12 @@ class BeforeDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        lo, hi = self.gen.__limits__()
+        if is_dgen(self.date) or self.date == date.min:
+            return lo, hi
+        return lo, min(hi, self.date - timedelta(days=1))
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         if is_dgen(self.date):
@@ -236,6 +872,42 @@ class BeforeDGen(DGen):
 
         yield from (d for d in self.gen.__invoke__(start, end, after, before, calendar) if d < before)
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            yield from super().__invoke_descending__(start, end, after, before, calendar)
+            return
+        before = self.date
+        yield from (d for d in self.gen.__invoke_descending__(start, end, after, before, calendar) if d < before)
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return None
+        before = self.date
+        if (view := self.gen.__view__(start, end, after, before, calendar)) is not None:
+            return view[:view._bisect_left(before)]
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__numpy__(start, end, after, before, calendar)
+        before = self.date
+        days = self.gen.__numpy__(start, end, after, before, calendar)
+        return days[days < np.datetime64(before, 'D')]
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__seek__(d, start, end, after, before, calendar)
+        before = self.date
+        x = self.gen.__seek__(d, start, end, after, before, calendar)
+        return x if x is not None and x < before else None
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__seek_back__(d, start, end, after, before, calendar)
+        before = self.date
+        if before == date.min:
+            return None
+        return self.gen.__seek_back__(min(d, before - timedelta(days=1)), start, end, after, before, calendar)
+
 
 class BeforeOrOnDGen(DGen):
     def __init__(self, gen, date):
@@ -245,6 +917,10 @@ class BeforeOrOnDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        lo, hi = self.gen.__limits__()
+        return (lo, hi) if is_dgen(self.date) else (lo, min(hi, self.date))
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         if is_dgen(self.date):
@@ -256,6 +932,40 @@ class BeforeOrOnDGen(DGen):
 
         yield from (d for d in self.gen.__invoke__(start, end, after, before, calendar) if d < before)
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            yield from super().__invoke_descending__(start, end, after, before, calendar)
+            return
+        before = self.date + timedelta(days=1)
+        yield from (d for d in self.gen.__invoke_descending__(start, end, after, before, calendar) if d < before)
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return None
+        before = self.date + timedelta(days=1)
+        if (view := self.gen.__view__(start, end, after, before, calendar)) is not None:
+            return view[:view._bisect_left(before)]
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__numpy__(start, end, after, before, calendar)
+        before = self.date + timedelta(days=1)
+        days = self.gen.__numpy__(start, end, after, before, calendar)
+        return days[days < np.datetime64(before, 'D')]
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__seek__(d, start, end, after, before, calendar)
+        before = self.date + timedelta(days=1)
+        x = self.gen.__seek__(d, start, end, after, before, calendar)
+        return x if x is not None and x < before else None
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if is_dgen(self.date):
+            return super().__seek_back__(d, start, end, after, before, calendar)
+        before = self.date + timedelta(days=1)
+        return self.gen.__seek_back__(min(d, self.date), start, end, after, before, calendar)
+
 
 class EveryDayDGen(DGen):
     def cadence(self):
@@ -270,6 +980,14 @@ class EveryDayDGen(DGen):
             yield start
             start += timedelta(days=1)
 
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        start = start if start is not date.min else after
+        end = end if end is not date.max else before
+        return _CadenceView(range(start.toordinal(), end.toordinal() + 1), _day, _day_ceil)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return _cadence_array(self.__view__(start, end, after, before, calendar), 'D')
+
 
 days = EveryDayDGen()
 
@@ -281,6 +999,9 @@ class WeekdaysDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        return self.gen.__limits__()
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         we = calendar.weekend_days() if calendar else (5, 6)
@@ -288,6 +1009,23 @@ class WeekdaysDGen(DGen):
                     self.gen.__invoke__(start, end, after, before, calendar)
                     if d.weekday() not in we)
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        we = calendar.weekend_days() if calendar else (5, 6)
+        yield from (d for d in self.gen.__invoke_descending__(start, end, after, before, calendar) if d.weekday() not in we)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        we = calendar.weekend_days() if calendar else (5, 6)
+        return _seek_filtered(self.gen, lambda x: x.weekday() not in we, d, (start, end, after, before, calendar))
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        we = calendar.weekend_days() if calendar else (5, 6)
+        return _seek_back_filtered(self.gen, lambda x: x.weekday() not in we, d, (start, end, after, before, calendar))
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        we = calendar.weekend_days() if calendar else (5, 6)
+        days = self.gen.__numpy__(start, end, after, before, calendar)
+        return days[~np.isin(_weekdays(days), we)]
+
 
 weekdays = WeekdaysDGen(days)
 
@@ -299,6 +1037,9 @@ class WeekendsDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        return self.gen.__limits__()
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         we = calendar.weekend_days() if calendar else (5, 6)
@@ -306,6 +1047,23 @@ class WeekendsDGen(DGen):
                     self.gen.__invoke__(start, end, after, before, calendar)
                     if d.weekday() in we)
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        we = calendar.weekend_days() if calendar else (5, 6)
+        yield from (d for d in self.gen.__invoke_descending__(start, end, after, before, calendar) if d.weekday() in we)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        we = calendar.weekend_days() if calendar else (5, 6)
+        return _seek_filtered(self.gen, lambda x: x.weekday() in we, d, (start, end, after, before, calendar))
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        we = calendar.weekend_days() if calendar else (5, 6)
+        return _seek_back_filtered(self.gen, lambda x: x.weekday() in we, d, (start, end, after, before, calendar))
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        we = calendar.weekend_days() if calendar else (5, 6)
+        days = self.gen.__numpy__(start, end, after, before, calendar)
+        return days[np.isin(_weekdays(days), we)]
+
 
 weekends = WeekendsDGen(EveryDayDGen())
 
@@ -317,6 +1075,9 @@ class BusinessDaysDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        return self.gen.__limits__()
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         assert calendar, 'Business days calculation requires a calendar'
@@ -324,6 +1085,26 @@ class BusinessDaysDGen(DGen):
                     self.gen.__invoke__(start, end, after, before, calendar)
                     if not calendar.is_holiday_or_weekend(d))
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        assert calendar, 'Business days calculation requires a calendar'
+        yield from (d for d in self.gen.__invoke_descending__(start, end, after, before, calendar) if not calendar.is_holiday_or_weekend(d))
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        assert calendar, 'Business days calculation requires a calendar'
+        return _seek_filtered(self.gen, lambda x: not calendar.is_holiday_or_weekend(x), d, (start, end, after, before, calendar))
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        assert calendar, 'Business days calculation requires a calendar'
+        return _seek_back_filtered(self.gen, lambda x: not calendar.is_holiday_or_weekend(x), d,
+                                   (start, end, after, before, calendar))
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        assert calendar, 'Business days calculation requires a calendar'
+        days = self.gen.__numpy__(start, end, after, before, calendar)
+        if type(calendar) is WeekendCalendar:
+            return days[~np.isin(_weekdays(days), calendar.weekend_days())]
+        return days[np.fromiter((not calendar.is_holiday_or_weekend(d) for d in days.tolist()), bool, len(days))]
+
 
 business_days = BusinessDaysDGen(EveryDayDGen())
 
@@ -342,6 +1123,14 @@ class WeeksDGen(DGen):
             yield monday
             monday += timedelta(days=7)
 
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        start = start if start is not date.min else after
+        end = end if end is not date.max else before
+        return _CadenceView(range(_week_ceil(start), (end.toordinal() - 1) // 7 + 1), _week, _week_ceil)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return _cadence_array(self.__view__(start, end, after, before, calendar), 'D', 7, 1)
+
     @property
     def mon(self):
         return self
@@ -388,6 +1177,18 @@ class DayOfWeekDGen(DGen):
             yield d
             d += timedelta(days=7)
 
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return _CadenceView(range(self._ceil(after), self._ceil(before)), self._to_date, self._ceil)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return _cadence_array(self.__view__(start, end, after, before, calendar), 'D', 7, 1 + self.weekday)
+
+    def _to_date(self, k):
+        return date.fromordinal(7 * k + 1 + self.weekday)
+
+    def _ceil(self, d):
+        return -(-(d.toordinal() - 1 - self.weekday) // 7)
+
 
 class AddTenorDGen(DGen):
     def __init__(self, gen, tenor):
@@ -397,12 +1198,62 @@ class AddTenorDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        if self.tenor.ymwd_b[-1]:
+            return date.min, date.max  # business days depend on the calendar
+        lo, hi = self.gen.__limits__()
+        return _shifted(self.tenor.add_to, lo, date.min), _shifted(self.tenor.add_to, hi, date.max)
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         start = start if start is not date.min else after
-        start = self.tenor.sub_from(start, calendar) if not self.tenor.is_neg() else start
+        if start is not date.min and not self.tenor.is_neg():
+            start = self.tenor.sub_from(start, calendar)
         yield from (self.tenor.add_to(d, calendar) for d in self.gen.__invoke__(start, end, after, before, calendar))
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        start = start if start is not date.min else after
+        if start is not date.min and not self.tenor.is_neg():
+            start = self.tenor.sub_from(start, calendar)
+        yield from (self.tenor.add_to(d, calendar)
+                    for d in self.gen.__invoke_descending__(start, end, after, before, calendar))
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        start = start if start is not date.min else after
+        if start is not date.min and not self.tenor.is_neg():
+            start = self.tenor.sub_from(start, calendar)
+        if (view := self.gen.__view__(start, end, after, before, calendar)) is not None:
+            # adding a tenor never reorders dates, so the shifted view stays sorted
+            return _ShiftView(view, lambda d: self.tenor.add_to(d, calendar))
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if start is date.min:
+            start = after
+        if start is not date.min and not self.tenor.is_neg():
+            start = self.tenor.sub_from(start, calendar)
+        return _tenor_array(self.tenor, self.gen.__numpy__(start, end, after, before, calendar), calendar)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        bounds = self._bounds(start, end, after, before, calendar)
+        return _seek_mapped(self.gen, lambda x: self.tenor.add_to(x, calendar), d, self._estimate(d, calendar), bounds)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        bounds = self._bounds(start, end, after, before, calendar)
+        return _seek_back_mapped(self.gen, lambda x: self.tenor.add_to(x, calendar), d, self._estimate(d, calendar),
+                                 bounds)
+
+    def _bounds(self, start, end, after, before, calendar):
+        start = start if start is not date.min else after
+        if start is not date.min and not self.tenor.is_neg():
+            start = self.tenor.sub_from(start, calendar)
+        return start, end, after, before, calendar
+
+    def _estimate(self, d, calendar):
+        try:
+            return self.tenor.sub_from(d, calendar)
+        except (ValueError, OverflowError):
+            return d
+
 
 class SubTenorDGen(DGen):
     def __init__(self, gen, tenor):
@@ -412,6 +1263,12 @@ class SubTenorDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        if self.tenor.ymwd_b[-1]:
+            return date.min, date.max
+        lo, hi = self.gen.__limits__()
+        return _shifted(self.tenor.sub_from, lo, date.min), _shifted(self.tenor.sub_from, hi, date.max)
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         end = end if end is not date.max else before
@@ -419,12 +1276,57 @@ class SubTenorDGen(DGen):
             end = self.tenor.add_to(end, calendar) if not self.tenor.is_neg() else end
         yield from (self.tenor.sub_from(d, calendar) for d in self.gen.__invoke__(start, end, after, before, calendar))
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        end = end if end is not date.max else before
+        if end is not date.max:
+            end = self.tenor.add_to(end, calendar) if not self.tenor.is_neg() else end
+        yield from (self.tenor.sub_from(d, calendar)
+                    for d in self.gen.__invoke_descending__(start, end, after, before, calendar))
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        end = end if end is not date.max else before
+        if end is not date.max:
+            end = self.tenor.add_to(end, calendar) if not self.tenor.is_neg() else end
+        if (view := self.gen.__view__(start, end, after, before, calendar)) is not None:
+            return _ShiftView(view, lambda d: self.tenor.sub_from(d, calendar))
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        end = end if end is not date.max else before
+        if end is not date.max:
+            end = self.tenor.add_to(end, calendar) if not self.tenor.is_neg() else end
+        return _tenor_array(self.tenor, self.gen.__numpy__(start, end, after, before, calendar), calendar, True)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        bounds = self._bounds(start, end, after, before, calendar)
+        return _seek_mapped(self.gen, lambda x: self.tenor.sub_from(x, calendar), d, self._estimate(d, calendar), bounds)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        bounds = self._bounds(start, end, after, before, calendar)
+        return _seek_back_mapped(self.gen, lambda x: self.tenor.sub_from(x, calendar), d, self._estimate(d, calendar),
+                                 bounds)
+
+    def _bounds(self, start, end, after, before, calendar):
+        end = end if end is not date.max else before
+        if end is not date.max and not self.tenor.is_neg():
+            end = self.tenor.add_to(end, calendar)
+        return start, end, after, before, calendar
+
+    def _estimate(self, d, calendar):
+        try:
+            return self.tenor.add_to(d, calendar)
+        except (ValueError, OverflowError):
+            return d
+
 
 class JoinDGen(DGen):
     def __init__(self, gen1, gen2):
         self.gen1 = gen1
         self.gen2 = gen2
 
+    def __limits__(self):
+        (lo1, hi1), (lo2, hi2) = self.gen1.__limits__(), self.gen2.__limits__()
+        return min(lo1, lo2), max(hi1, hi2)
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         g1 = self.gen1.__invoke__(start, end, after, before, calendar)
@@ -452,16 +1354,66 @@ class JoinDGen(DGen):
                 yield d2
                 d2 = next(g2, None)
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        g1 = self.gen1.__invoke_descending__(start, end, after, before, calendar)
+        g2 = self.gen2.__invoke_descending__(start, end, after, before, calendar)
+
+        d1 = next(g1, None)
+        d2 = next(g2, None)
+        while d1 is not None or d2 is not None:
+            if d1 is None:
+                yield d2
+                yield from g2
+                return
+            elif d2 is None:
+                yield d1
+                yield from g1
+                return
+            elif d1 == d2:
+                yield d1
+                d1 = next(g1, None)
+                d2 = next(g2, None)
+            elif d1 > d2:
+                yield d1
+                d1 = next(g1, None)
+            else:
+                yield d2
+                d2 = next(g2, None)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        days1 = self.gen1.__numpy__(start, end, after, before, calendar)
+        days2 = self.gen2.__numpy__(start, end, after, before, calendar)
+        # the set operations match the merge only for sorted dates without repeats
+        if _increasing(days1) and _increasing(days2):
+            return np.union1d(days1, days2)
+        return super().__numpy__(start, end, after, before, calendar)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        d1 = self.gen1.__seek__(d, start, end, after, before, calendar)
+        d2 = self.gen2.__seek__(d, start, end, after, before, calendar)
+        return d2 if d1 is None else d1 if d2 is None else min(d1, d2)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        d1 = self.gen1.__seek_back__(d, start, end, after, before, calendar)
+        d2 = self.gen2.__seek_back__(d, start, end, after, before, calendar)
+        return d2 if d1 is None else d1 if d2 is None else max(d1, d2)
+
 
 class CommonDatesDGen(DGen):
     def __init__(self, gen1, gen2):
         self.gen1 = gen1
         self.gen2 = gen2
 
+    def __limits__(self):
+        (lo1, hi1), (lo2, hi2) = self.gen1.__limits__(), self.gen2.__limits__()
+        return max(lo1, lo2), min(hi1, hi2)
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
-        g1 = self.gen1.__invoke__(start, end, after, before, calendar)
-        g2 = self.gen2.__invoke__(start, end, after, before, calendar)
+        # neither generator needs to generate dates outside the other's limits
+        limits = self.__limits__()
+        g1 = self.gen1.__invoke__(start, end, *_narrowed(self.gen1, after, before, limits), calendar)
+        g2 = self.gen2.__invoke__(start, end, *_narrowed(self.gen2, after, before, limits), calendar)
 
         d1 = next(g1, None)
         d2 = next(g2, None)
@@ -475,16 +1427,62 @@ class CommonDatesDGen(DGen):
             else:
                 d2 = next(g2, None)
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        limits = self.__limits__()
+        g1 = self.gen1.__invoke_descending__(start, end, *_narrowed(self.gen1, after, before, limits), calendar)
+        g2 = self.gen2.__invoke_descending__(start, end, *_narrowed(self.gen2, after, before, limits), calendar)
+
+        d1 = next(g1, None)
+        d2 = next(g2, None)
+        while d1 is not None and d2 is not None:
+            if d1 == d2:
+                yield d1
+                d1 = next(g1, None)
+                d2 = next(g2, None)
+            elif d1 > d2:
+                d1 = next(g1, None)
+            else:
+                d2 = next(g2, None)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        limits = self.__limits__()
+        days1 = self.gen1.__numpy__(start, end, *_narrowed(self.gen1, after, before, limits), calendar)
+        days2 = self.gen2.__numpy__(start, end, *_narrowed(self.gen2, after, before, limits), calendar)
+        if _increasing(days1) and _increasing(days2):
+            return np.intersect1d(days1, days2, assume_unique=True)
+        return super().__numpy__(start, end, after, before, calendar)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        # each generator seeks to the other's date until they meet
+        d1 = self.gen1.__seek__(d, start, end, after, before, calendar)
+        while d1 is not None:
+            if (d2 := self.gen2.__seek__(d1, start, end, after, before, calendar)) is None or d2 == d1:
+                return d2
+            d1 = self.gen1.__seek__(d2, start, end, after, before, calendar)
+        return None
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        d1 = self.gen1.__seek_back__(d, start, end, after, before, calendar)
+        while d1 is not None:
+            if (d2 := self.gen2.__seek_back__(d1, start, end, after, before, calendar)) is None or d2 == d1:
+                return d2
+            d1 = self.gen1.__seek_back__(d2, start, end, after, before, calendar)
+        return None
+
 
 class RemoveDatesDGen(DGen):
     def __init__(self, gen1, gen2):
         self.gen1 = gen1
         self.gen2 = gen2
 
+    def __limits__(self):
+        return self.gen1.__limits__()
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
+        # only the dates to remove within the limits of the first generator matter
         g1 = self.gen1.__invoke__(start, end, after, before, calendar)
-        g2 = self.gen2.__invoke__(start, end, after, before, calendar)
+        g2 = self.gen2.__invoke__(start, end, *_narrowed(self.gen2, after, before, self.gen1.__limits__()), calendar)
 
         d1 = next(g1, None)
         d2 = next(g2, None)
@@ -502,6 +1500,42 @@ class RemoveDatesDGen(DGen):
                 yield d1
                 d1 = next(g1, None)
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        g1 = self.gen1.__invoke_descending__(start, end, after, before, calendar)
+        g2 = self.gen2.__invoke_descending__(start, end, *_narrowed(self.gen2, after, before, self.gen1.__limits__()),
+                                             calendar)
+
+        d1 = next(g1, None)
+        d2 = next(g2, None)
+        while d1 is not None and d2 is not None:
+            if d1 == d2:
+                d1 = next(g1, None)
+                d2 = next(g2, None)
+            elif d1 > d2:
+                yield d1
+                d1 = next(g1, None)
+            else:
+                d2 = next(g2, None)
+        if d2 is None:
+            while d1 is not None:
+                yield d1
+                d1 = next(g1, None)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        days1 = self.gen1.__numpy__(start, end, after, before, calendar)
+        days2 = self.gen2.__numpy__(start, end, *_narrowed(self.gen2, after, before, self.gen1.__limits__()), calendar)
+        if _increasing(days1) and _increasing(days2):
+            return days1[~np.isin(days1, days2, assume_unique=True)]
+        return super().__numpy__(start, end, after, before, calendar)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        bounds = start, end, after, before, calendar
+        return _seek_filtered(self.gen1, lambda x: self.gen2.__seek__(x, *bounds) != x, d, bounds)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        bounds = start, end, after, before, calendar
+        return _seek_back_filtered(self.gen1, lambda x: self.gen2.__seek__(x, *bounds) != x, d, bounds)
+
 
 class MonthsDGen(DGen):
     def cadence(self):
@@ -519,6 +1553,14 @@ class MonthsDGen(DGen):
             month = first.month % 12 + 1
             first = date(year, month, 1)
 
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        start = start if start is not date.min else after
+        end = end if end is not date.max else before
+        return _CadenceView(range(start.year * 12 + start.month - 1, end.year * 12 + end.month), _month, _month_ceil)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return _cadence_array(self.__view__(start, end, after, before, calendar), 'M')
+
     @property
     def end(self):
         return months - '1d'
@@ -587,22 +1629,133 @@ class SubSequenceDGen(DGen):
     def cadence(self):
         return self.sub_sequence.cadence()
 
+    def __limits__(self):
+        lo, hi = self.main_sequence.__limits__()
+        if hi < date.max:
+            hi = _shifted(self.main_sequence.cadence().add_to, hi, date.max)
+            hi = hi - timedelta(days=1) if hi < date.max else hi
+        return lo, hi
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         for begin in self.main_sequence.__invoke__(start, end, after, before, calendar):
             end = self.main_sequence.cadence().add_to(begin)
             sub_sequence = cast(DGen, begin <= self.sub_sequence < end)
             if self.slice is None:
-                yield from (d for d in sub_sequence() if d < before)
+                yield from (d for d in sub_sequence.__invoke__() if d < before)
             else:
                 if is_negative_slice(self.slice):
-                    yield from [d for d in sub_sequence() if d < before][self.slice]
+                    yield from self._period_view(begin, before)
                 else:
-                    yield from (d for d in islice(sub_sequence(), self.slice.start, self.slice.stop, self.slice.step) if d < before)
+                    yield from (d for d in islice(sub_sequence.__invoke__(), self.slice.start, self.slice.stop, self.slice.step) if d < before)
+
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        for begin in self.main_sequence.__invoke_descending__(start, end, after, before, calendar):
+            yield from reversed(self._period_view(begin, before))
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if (periods := self.main_sequence.__view__(start, end, after, before, calendar)) is None:
+            return None
+        cadence = self.main_sequence.cadence()
+        length = _group_length(cadence, self.sub_sequence, self.slice)
+        return _GroupedView(periods, lambda begin: self._period_view(begin, before), length, cadence, before)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if _group_length(self.main_sequence.cadence(), self.sub_sequence, self.slice) == 0:
+            return None
+        bounds = start, end, after, before, calendar
+        # the dates of a period follow its beginning, so the search starts with the period d falls into
+        begin = self.main_sequence.__seek_back__(d, *bounds)
+        if begin is None:
+            begin = self.main_sequence.__seek__(d, *bounds)
+        while begin is not None:
+            if (x := self._period_view(begin, before)._seek(d)) is not None:
+                return x
+            begin = _seek_after(self.main_sequence, begin, bounds)
+        return None
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if _group_length(self.main_sequence.cadence(), self.sub_sequence, self.slice) == 0:
+            return None
+        bounds = start, end, after, before, calendar
+        begin = self.main_sequence.__seek_back__(d, *bounds)
+        while begin is not None:
+            if (x := self._period_view(begin, before)._seek_back(d)) is not None:
+                return x
+            begin = _seek_before(self.main_sequence, begin, bounds)
+        return None
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        sub_type = type(self.sub_sequence)
+        filtered = sub_type in (WeekdaysDGen, WeekendsDGen) and type(self.sub_sequence.gen) is EveryDayDGen
+        if not filtered and sub_type not in (EveryDayDGen, WeeksDGen, DayOfWeekDGen, MonthsDGen):
+            return super().__numpy__(start, end, after, before, calendar)
+
+        begins = self.main_sequence.__numpy__(start, end, after, before, calendar)
+        ends = _tenor_array(self.main_sequence.cadence(), begins, None)
+        negative = self.slice is not None and is_negative_slice(self.slice)
+        if self.slice is None or negative:
+            # the dates of a period are cut at before ahead of the slice
+            ends = np.minimum(ends, np.datetime64(before, 'D'))
+
+        # the dates of each period run from `first` by `step` (in the unit of `first`), `counts` of them
+        if sub_type is MonthsDGen:
+            first = begins.astype('datetime64[M]')
+            first = first + (first.astype('datetime64[D]') < begins)
+            last = ends.astype('datetime64[M]')
+            last = last + (last.astype('datetime64[D]') < ends)
+            counts, step = (last - first).astype(np.int64), 1
+        else:
+            step = 1 if filtered or sub_type is EveryDayDGen else 7
+            weekday = self.sub_sequence.weekday if sub_type is DayOfWeekDGen else 0
+            first = begins if step == 1 else begins + (weekday - _weekdays(begins)) % 7
+            counts = -(-(ends - first).astype(np.int64) // step)
+        counts = np.maximum(counts, 0)
+
+        if filtered:
+            # every day of the periods, masked like the sub sequence's own (calendar-less) invocation
+            periods = np.repeat(np.arange(len(counts)), counts)
+            flat = first[periods] + (np.arange(len(periods)) - (np.cumsum(counts) - counts)[periods])
+            keep = np.isin(_weekdays(flat), (5, 6)) == (sub_type is WeekendsDGen)
+            flat, counts = flat[keep], np.bincount(periods[keep], minlength=len(counts))
+            starts = np.cumsum(counts) - counts
+
+        item = self.slice or slice(None)
+        sizes = np.unique(counts)
+        lengths = np.zeros(len(counts), dtype=np.int64)
+        for size in sizes:
+            lengths[counts == size] = len(range(size)[item])
+        offsets = np.cumsum(lengths) - lengths
+
+        days = np.empty(int(lengths.sum()), dtype='datetime64[D]')
+        for size in sizes:
+            if not len(index := np.arange(size)[item]):
+                continue
+            periods = np.nonzero(counts == size)[0]
+            if filtered:
+                dates = flat[starts[periods, None] + index]
+            else:
+                dates = (first[periods, None] + index * step).astype('datetime64[D]')
+            days[offsets[periods, None] + np.arange(len(index))] = dates
+
+        if self.slice is not None and not negative:
+            days = days[days < np.datetime64(before, 'D')]
+        return days
+
+    def _period_view(self, begin, before):
+        end = _period_end(self.main_sequence.cadence(), begin)
+        view = _view_of(self.sub_sequence, date.min, date.max, begin, end, None)
+        view = view[view._bisect_left(begin):view._bisect_left(end) if end < date.max else len(view)]
+        if self.slice is not None and not is_negative_slice(self.slice):
+            view = view[self.slice]
+        view = view[:view._bisect_left(before)]
+        if self.slice is not None and is_negative_slice(self.slice):
+            view = view[self.slice]
+        return view
 
     def __getitem__(self, item):
         if isinstance(item, int):
-            return SubSequenceDGen(self.main_sequence, self.sub_sequence, slice(item, item + 1))
+            return SubSequenceDGen(self.main_sequence, self.sub_sequence, slice(item, item + 1 or None))
         if isinstance(item, slice):
             return SubSequenceDGen(self.main_sequence, self.sub_sequence, item)
         if isinstance(item, Op):
@@ -617,7 +1770,7 @@ class DaysOfMonthDGen(DGen):
                    calendar: Calendar = None):
         for month in self.months.__invoke__(start, end, after, before, calendar):
             next_month = Tenor('1m').add_to(month)
-            yield from (month <= self.days < next_month)()
+            yield from cast(DGen, month <= self.days < next_month).__invoke__()
 
 
 class YearsDGen(DGen):
@@ -634,6 +1787,14 @@ class YearsDGen(DGen):
             yield first
             first = date(first.year + 1, 1, 1)
 
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        start = start if start is not date.min else after
+        end = end if end is not date.max else before
+        return _CadenceView(range(start.year, end.year + 1), _year, _year_ceil)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return _cadence_array(self.__view__(start, end, after, before, calendar), 'Y')
+
     @property
     def end(self):
         return years - '1d'
@@ -718,10 +1879,20 @@ class SliceDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        return self.gen.__limits__()
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         yield from islice(self.gen.__invoke__(start, end, after, before, calendar), self.slice.start, self.slice.stop, self.slice.step)
 
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        if (view := self.gen.__view__(start, end, after, before, calendar)) is not None:
+            return view[self.slice]
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return self.gen.__numpy__(start, end, after, before, calendar)[self.slice]
+
 
 class WithCalendarDGen(DGen):
     def __init__(self, gen, calendar):
@@ -729,12 +1900,30 @@ class WithCalendarDGen(DGen):
         self.calendar = calendar
 
     def cadence(self):
-        return self.gen.cadence
+        return self.gen.cadence()
+
+    def __limits__(self):
+        return self.gen.__limits__()
 
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         yield from (d for d in self.gen.__invoke__(start, end, after, before, self.calendar))
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        yield from self.gen.__invoke_descending__(start, end, after, before, self.calendar)
+
+    def __view__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return self.gen.__view__(start, end, after, before, self.calendar)
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return self.gen.__seek__(d, start, end, after, before, self.calendar)
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return self.gen.__numpy__(start, end, after, before, self.calendar)
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        return self.gen.__seek_back__(d, start, end, after, before, self.calendar)
+
 
 class RollFwdDGen(DGen):
     def __init__(self, gen, calendar=None):
@@ -744,12 +1933,35 @@ class RollFwdDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        return self.gen.__limits__()[0], date.max
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         c = self.calendar or calendar
         assert c, 'Business days calculation requires a calendar'
         yield from (c.add_business_days(d, 0) for d in self.gen.__invoke__(start, end, after, before, calendar))
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        c = self.calendar or calendar
+        assert c, 'Business days calculation requires a calendar'
+        yield from (c.add_business_days(d, 0) for d in self.gen.__invoke_descending__(start, end, after, before, calendar))
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        c = self.calendar or calendar
+        assert c, 'Business days calculation requires a calendar'
+        return _seek_mapped(self.gen, lambda x: c.add_business_days(x, 0), d, d, (start, end, after, before, calendar))
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        c = self.calendar or calendar
+        assert c, 'Business days calculation requires a calendar'
+        return _seek_back_mapped(self.gen, lambda x: c.add_business_days(x, 0), d, d, (start, end, after, before, calendar))
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        c = self.calendar or calendar
+        assert c, 'Business days calculation requires a calendar'
+        return _business_days_array(c, self.gen.__numpy__(start, end, after, before, calendar), 0, False)
+
 
 def roll_fwd(x, calendar=None):
     return RollFwdDGen(x, calendar)
@@ -763,13 +1975,47 @@ class RollBwdDGen(DGen):
     def cadence(self):
         return self.gen.cadence()
 
+    def __limits__(self):
+        return date.min, self.gen.__limits__()[1]
+
     def __invoke__(self, start: date = date.min, end: date = date.max, after: date = date.min, before: date = date.max,
                    calendar: Calendar = None):
         c = self.calendar or calendar
         assert c, 'Business days calculation requires a calendar'
         yield from (c.sub_business_days(d, 0) for d in self.gen.__invoke__(start, end, after, before, calendar))
 
+    def __invoke_descending__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        c = self.calendar or calendar
+        assert c, 'Business days calculation requires a calendar'
+        yield from (c.sub_business_days(d, 0) for d in self.gen.__invoke_descending__(start, end, after, before, calendar))
+
+    def __seek__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        c = self.calendar or calendar
+        assert c, 'Business days calculation requires a calendar'
+        return _seek_mapped(self.gen, lambda x: c.sub_business_days(x, 0), d, d, (start, end, after, before, calendar))
+
+    def __seek_back__(self, d: date, start: date, end: date, after: date, before: date, calendar: Calendar):
+        c = self.calendar or calendar
+        assert c, 'Business days calculation requires a calendar'
+        return _seek_back_mapped(self.gen, lambda x: c.sub_business_days(x, 0), d, d, (start, end, after, before, calendar))
+
+    def __numpy__(self, start: date, end: date, after: date, before: date, calendar: Calendar):
+        c = self.calendar or calendar
+        assert c, 'Business days calculation requires a calendar'
+        return _business_days_array(c, self.gen.__numpy__(start, end, after, before, calendar), 0, True)
+
 
 def roll_bwd(x, calendar=None):
     return RollBwdDGen(x, calendar)
 
+
+@contextmanager
+def as_of(anchor):
+    """Within the block calls that leave their start open generate dates from the anchor on, descending calls
+    that leave their end open generate dates up to the anchor"""
+    token = _as_of.set(make_date(anchor))
+    try:
+        yield
+    finally:
+        _as_of.reset(token)
+
@@ -1,13 +1,37 @@
+import ast
+import asyncio
+import collections.abc
+import concurrent.futures
+import copy
+import dis
+import functools
+import importlib
 import inspect
 import itertools
+import marshal
 import operator
+import os
+import re
+import pickle
 import site
 import sys
-from collections import defaultdict
+import threading
+import time
+import types
+import weakref
+from collections import Counter, defaultdict, deque, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from typing import Callable, Union, Sequence, Mapping
 
-__all__ = ('lazy', 'calc', 'const', 'ParameterOp')
+try:
+    import numpy as np
+except ImportError:  # numpy is only required by calc_batch
+    np = None
+
+__all__ = ('lazy', 'pure', 'where', 'and_', 'or_', 'if_', 'coalesce', 'calc', 'const', 'build', 'parse',
+           'specialize', 'profiling', 'ParameterOp', 'LRU')
 
 
 def is_op(obj):
@@ -24,6 +48,14 @@ def make_op(obj):
             return ComprehensionOp(type(obj), item if not isinstance(obj, dict) else KeyValueOp(next(iter(obj.items()))))
         else:
             return SequenceOp(obj)
+    if isinstance(obj, types.GeneratorType) and obj.gi_code.co_name == '<genexpr>':
+        # a generator expression iterating an Op, whose iterator is the hidden argument of its frame
+        if obj.gi_frame is None:
+            raise TypeError('a generator expression can not be made an Op once it has run, pass it unstarted')
+        if isinstance(obj.gi_frame.f_locals.get('.0'), IterOp):
+            if inspect.getgeneratorstate(obj) != inspect.GEN_CREATED:
+                raise TypeError('a generator expression iterating an Op can not be made an Op once started')
+            return ComprehensionOp(types.GeneratorType, next(obj))
 
     return ConstOp(obj)
 
@@ -36,7 +68,86 @@ def const(obj):
     return make_op(obj)
 
 
-class Op:
+def where(item, condition):
+    """Filters the items of a comprehension: `[where(i * 2, i > 2) for i in _0]` is the list of `i * 2` for the
+    `i` in `_0` greater than 2. Several conditions are combined with `&` or by nesting `where`"""
+    return WhereOp(make_op(item), make_op(condition))
+
+
+def and_(*items):
+    """Like `and`: the first of the items that is false, or the last one. Items after it are not evaluated"""
+    return ShortCircuitOp('and_', items)
+
+
+def or_(*items):
+    """Like `or`: the first of the items that is true, or the last one. Items after it are not evaluated"""
+    return ShortCircuitOp('or_', items)
+
+
+def coalesce(*items):
+    """The first of the items that is neither None nor fails, or the last one. Items after it are not evaluated"""
+    return ShortCircuitOp('coalesce', items)
+
+
+def if_(condition, then, else_=None):
+    """`then` if the condition is true, otherwise `else_`. Only the chosen branch is evaluated"""
+    return IfOp(make_op(condition), make_op(then), make_op(else_))
+
+
+def pure(obj, cache: 'LRU' = None):
+    """Like `lazy`, but marks the callable as free of side effects, so `optimize` can fold calls to it with
+    constant arguments. With a `cache`, e.g. `pure(fn, cache=LRU(1024))`, the results of calls are kept across
+    evaluations, keyed by the argument values"""
+    return ConstOp(obj, _pure=True, _cache=cache)
+
+
+_interner: ContextVar = ContextVar('_interner', default=None)
+_interning_lock = threading.Lock()
+_interning_count = 0
+
+_profile: ContextVar = ContextVar('_profile', default=None)
+_profiling_lock = threading.Lock()
+_profiling_count = 0
+
+
+class _OpMeta(type):
+    pass
+
+
+def _interning_call(cls, *args, **kwargs):
+    op = type.__call__(cls, *args, **kwargs)
+    if (interner := _interner.get()) is not None:
+        return interner(op)
+    return op
+
+
+# reversals of the comparisons, module level so that they are referenced by import path when serialized
+def _reversed_lt(op):
+    return op._rhs > op._lhs
+
+
+def _reversed_le(op):
+    return op._rhs >= op._lhs
+
+
+def _reversed_gt(op):
+    return op._rhs < op._lhs
+
+
+def _reversed_ge(op):
+    return op._rhs <= op._lhs
+
+
+class Op(metaclass=_OpMeta):
+    # True when __eval__ is a generator that yields the operands it needs evaluated, see _Frame.eval
+    __stepwise__ = False
+    # True when all operands are evaluated unless one fails, so acalc can evaluate them concurrently upfront
+    __eager__ = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.__stepwise__ = inspect.isgeneratorfunction(cls.__eval__)
+
     def __init__(self, _priority):
         self._priority: int = _priority
 
@@ -46,12 +157,66 @@ class Op:
     def __is_const__(self):
         return False
 
+    def __is_foldable__(self):
+        return False
+
+    def __optimize__(self, fn):
+        op = _rebuild(self, fn)
+        return _fold(op) if op.__is_foldable__() else op
+
     def __visit_operands__(self, fn):
         raise NotImplementedError()
 
+    def __key__(self, key):
+        return type(self), id(self)
+
     def __transform__(self, fn=lambda x: x, new_class=None):
         raise NotImplementedError()
 
+    def __eval__(self, frame):
+        raise NotImplementedError()
+
+    def __repr_node__(self, r):
+        raise NotImplementedError()
+
+    def __repr__(self):
+        # the string of a node is dropped once the last node using it has been written. Comprehensions write
+        # their items apart, so the walk does not enter them
+        nodes = list(_postorder(self, lambda x: not isinstance(x, ComprehensionOp)))
+        uses = Counter(id(o) for x in nodes if not isinstance(x, ComprehensionOp) for o in _operands(x))
+        reprs = {}
+
+        def r(x):
+            if not isinstance(x, Op):
+                return repr(x)
+            if (s := reprs.get(id(x))) is None:  # not among the operands of the node written
+                return repr(x)
+            uses[id(x)] -= 1
+            if uses[id(x)] <= 0:
+                del reprs[id(x)]
+            return s
+
+        for x in nodes:
+            reprs[id(x)] = x.__repr_node__(r)
+        return reprs[id(self)]
+
+    def __invoke__(self, *args, **kwargs):
+        return _Frame(args, kwargs, _shared_nodes(self)).eval(self)
+
+    def __compile__(self, c):
+        invoke = self.__invoke__
+
+        def f(args, kwargs, memo):
+            r = invoke(*args, **kwargs)
+            if isinstance(r, FailedOp):
+                raise r
+            return r
+
+        return f
+
+    def __batch__(self, batch):
+        return batch.rowwise(self)
+
     def __getattr__(self, item: str):
         if item.startswith('__') and item.endswith('__'):
             raise AttributeError
@@ -75,20 +240,18 @@ class Op:
     #         return (self.__wrapped__,)
 
     def __lt__(self, other):
-        o = BinaryOpReversible(6, self, other, operator.lt, '<',
-                               lambda x: x._rhs > x._lhs)
+        o = BinaryOpReversible(6, self, other, operator.lt, '<', _reversed_lt)
 
-        if lhs := getattr(self, '__compared__', None):
-            return ChainCompareOp(self, lhs, o)
+        if (lhs := pop_compared(self)) is not None:
+            return chain_compare(self, lhs, o)
         else:
             return o
 
     def __le__(self, other):
-        o = BinaryOpReversible(6, self, other, operator.le, '<=',
-                               lambda x: x._rhs >= x._lhs)
+        o = BinaryOpReversible(6, self, other, operator.le, '<=', _reversed_le)
 
-        if lhs := getattr(self, '__compared__', None):
-            return ChainCompareOp(self, lhs, o)
+        if (lhs := pop_compared(self)) is not None:
+            return chain_compare(self, lhs, o)
         else:
             return o
 
@@ -99,12 +262,10 @@ class Op:
         return BinaryOp(6, self, other, operator.ne, '!=')
 
     def __gt__(self, other):
-        return BinaryOpReversible(6, self, other, operator.gt, '>',
-                                  lambda x: x._rhs < x._lhs)
+        return BinaryOpReversible(6, self, other, operator.gt, '>', _reversed_gt)
 
     def __ge__(self, other):
-        return BinaryOpReversible(6, self, other, operator.ge, '>=',
-                                  lambda x: x._rhs <= x._lhs)
+        return BinaryOpReversible(6, self, other, operator.ge, '>=', _reversed_ge)
 
     def __hash__(self):
         return id(self)
@@ -212,45 +373,73 @@ class Op:
         return IterOp(self)
 
     def __copy__(self):
-        raise NotImplementedError()
+        return self  # nodes are not changed once built
 
     def __deepcopy__(self, memo):
-        raise NotImplementedError()
+        copies = {}
+        for x in _postorder(self):
+            if (r := memo.get(id(x))) is None:
+                r = memo[id(x)] = object.__new__(type(x))
+                r.__setstate__({k: _map_value(v, lambda o: copies[id(o)], lambda y: copy.deepcopy(y, memo))
+                                for k, v in _node_state(x).items()})
+            copies[id(x)] = r
+        return copies[id(self)]
 
     def __reduce__(self):
-        raise NotImplementedError()
+        return loads, (dumps(self),)
 
     def __reduce_ex__(self, protocol):
-        raise NotImplementedError()
+        return self.__reduce__()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+_invoke = Op.__invoke__  # restored when profiling ends
 
 
 class ConstOp(Op):
 
-    def __init__(self, _value):
+    def __init__(self, _value, _pure=False, _cache=None):
         super().__init__(_priority=18)
         self._value = _value
+        self._pure: bool = _pure
+        self._cache: LRU = _cache
         if isinstance(_value, Item):
             _value.__expression__ = self
 
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if isinstance(self._value, Item):
+            self._value.__expression__ = self
+
     def __is_const__(self):
         return True
 
-    def __repr__(self):
+    def __repr_node__(self, r):
         if isinstance(self._value, type):
             return self._value.__qualname__
         return repr(self._value) if not isinstance(self._value, str) else f"'{self._value}'"
 
-    def __invoke__(self, *args, **kwargs):
-        if isinstance(self._value, Item):
-            self._value.__expression__ = None
-
+    def __eval__(self, frame):
         return self._value
 
+    def __batch__(self, batch):
+        return self.__eval__(batch)
+
+    def __compile__(self, c):
+        value = self._value
+        return lambda args, kwargs, memo: value
+
     def __visit_operands__(self, fn):
         return fn(self._value)[0]
 
+    def __key__(self, key):
+        # the cache is compared by identity, nodes calling through different caches are not merged
+        return ConstOp, key(self._value), self._pure, self._cache
+
     def __transform__(self, fn=lambda x: x, new_class=None):
-        return (new_class or ConstOp)(self._value)
+        return (new_class or ConstOp)(self._value, self._pure, self._cache)
 
 
 class GetattrOp(Op):
@@ -259,25 +448,40 @@ class GetattrOp(Op):
         self._obj = _obj
         self._attr = _attr
 
-    def __repr__(self):
-        return f"{repr_inner(self, self._obj)}.{self._attr}"
+    def __repr_node__(self, r):
+        return f"{repr_inner(self, self._obj, r)}.{self._attr}"
 
-    def __invoke__(self, *args, **kwargs):
-        obj = self._obj.__invoke__(*args, **kwargs)
+    def __eval__(self, frame):
+        obj = yield self._obj
         if isinstance(obj, FailedOp):
             return obj
 
         try:
             obj = getattr(obj, self._attr)
         except AttributeError as e:
-            return FailedOp(f"{obj} does not have an attribute named {self._attr}", cause=e)
+            return FailedOp(f"{obj} does not have an attribute named {self._attr}", e)
 
         return obj
 
+    def __compile__(self, c):
+        obj, attr = c(self._obj), self._attr
+
+        def f(args, kwargs, memo):
+            o = obj(args, kwargs, memo)
+            try:
+                return getattr(o, attr)
+            except AttributeError as e:
+                raise FailedOp(f"{o} does not have an attribute named {attr}", e) from None
+
+        return f
+
     def __visit_operands__(self, fn):
         r, c = fn(self._obj)
         return r
 
+    def __key__(self, key):
+        return GetattrOp, key(self._obj), self._attr
+
     def __transform__(self, fn=lambda x: x, new_class=None):
         return (new_class or GetattrOp)(fn(self._obj), self._attr)
 
@@ -289,14 +493,32 @@ class UnaryOp(Op):
         self._op: Callable = _op
         self._format: str = _format
 
-    def __repr__(self):
+    def __repr_node__(self, r):
         if self._format:
-            return self._format.format(repr_inner(self, self._obj))
+            return self._format.format(repr_inner(self, self._obj, r))
         else:
-            return f"{self._op.__name__}{repr_inner(self, self._obj)}"
+            return f"{self._op.__name__}{repr_inner(self, self._obj, r)}"
 
-    def __invoke__(self, *args, **kwargs):
-        obj = self._obj.__invoke__(*args, **kwargs)
+    def __eval__(self, frame):
+        obj = yield self._obj
+        if isinstance(obj, FailedOp):
+            return obj
+
+        return self._op(obj)
+
+    def __compile__(self, c):
+        obj, op = c(self._obj), self._op
+
+        def f(args, kwargs, memo):
+            r = op(obj(args, kwargs, memo))
+            if isinstance(r, FailedOp):
+                raise r
+            return r
+
+        return f
+
+    def __batch__(self, batch):
+        obj = batch.eval(self._obj)
         if isinstance(obj, FailedOp):
             return obj
 
@@ -306,6 +528,19 @@ class UnaryOp(Op):
         r, c = fn(self._obj)
         return r
 
+    def __is_foldable__(self):
+        return self._obj.__is_const__()
+
+    def __optimize__(self, fn):
+        op = super().__optimize__(fn)
+        if type(op) is UnaryOp and op._op in (operator.neg, operator.invert) \
+                and type(op._obj) is UnaryOp and op._obj._op is op._op:
+            return op._obj._obj
+        return op
+
+    def __key__(self, key):
+        return type(self), self._priority, self._op, self._format, key(self._obj)
+
     def __transform__(self, fn=lambda x: x, new_class=None):
         return (new_class or UnaryOp)(self._priority, fn(self._obj), self._op, self._format)
 
@@ -318,17 +553,38 @@ class BinaryOp(Op):
         self._op: Callable = _op
         self._format: str = _format
 
-    def __repr__(self):
+    def __repr_node__(self, r):
         if self._format:
-            return f"{repr_inner(self, self._lhs)} {self._format} {repr_inner(self, self._rhs)}"
+            return f"{repr_inner(self, self._lhs, r)} {self._format} {repr_inner(self, self._rhs, r)}"
         else:
-            return f"{repr_inner(self, self._lhs)} {self._op.__name__} {repr_inner(self, self._rhs)}"
+            return f"{repr_inner(self, self._lhs, r)} {self._op.__name__} {repr_inner(self, self._rhs, r)}"
 
-    def __invoke__(self, *args, **kwargs):
-        lhs = self._lhs.__invoke__(*args, **kwargs)
+    def __eval__(self, frame):
+        lhs = yield self._lhs
+        if isinstance(lhs, FailedOp):
+            return lhs
+        rhs = yield self._rhs
+        if isinstance(rhs, FailedOp):
+            return rhs
+
+        return self._op(lhs, rhs)
+
+    def __compile__(self, c):
+        lhs, rhs, op = c(self._lhs), c(self._rhs), self._op
+
+        def f(args, kwargs, memo):
+            r = op(lhs(args, kwargs, memo), rhs(args, kwargs, memo))
+            if isinstance(r, FailedOp):
+                raise r
+            return r
+
+        return f
+
+    def __batch__(self, batch):
+        lhs = batch.eval(self._lhs)
         if isinstance(lhs, FailedOp):
             return lhs
-        rhs = self._rhs.__invoke__(*args, **kwargs)
+        rhs = batch.eval(self._rhs)
         if isinstance(rhs, FailedOp):
             return rhs
 
@@ -336,9 +592,6 @@ class BinaryOp(Op):
 
     def __bool__(self):
         if self.__priority__() == 6:
-            self._lhs.__compared___ = self
-            self._rhs.__compared___ = self
-
             return True
 
     def __visit_operands__(self, fn):
@@ -347,16 +600,38 @@ class BinaryOp(Op):
         r, c = fn(self._rhs)
         return r
 
+    def __is_foldable__(self):
+        return self._lhs.__is_const__() and self._rhs.__is_const__()
+
+    def __optimize__(self, fn):
+        op = super().__optimize__(fn)
+        if type(op) is BinaryOp:
+            if op._op is operator.mul:
+                if _is_int_const(op._rhs, 1): return op._lhs
+                if _is_int_const(op._lhs, 1): return op._rhs
+            elif op._op is operator.add:
+                if _is_int_const(op._rhs, 0): return op._lhs
+                if _is_int_const(op._lhs, 0): return op._rhs
+            elif op._op is operator.sub:
+                if _is_int_const(op._rhs, 0): return op._lhs
+        return op
+
+    def __key__(self, key):
+        return type(self), self._priority, self._op, self._format, key(self._lhs), key(self._rhs)
+
     def __transform__(self, fn=lambda x: x, new_class=None):
         return (new_class or self.__class__)(self._priority, fn(self._lhs), fn(self._rhs), self._op, self._format)
 
 
 class BinaryOpSpecial(BinaryOp):
-    def __repr__(self):
+    # getitem, divmod and round do not have elementwise meaning on whole columns
+    __batch__ = Op.__batch__
+
+    def __repr_node__(self, r):
         if self._format:
-            return self._format.format(repr(self._lhs), repr(self._rhs))
+            return self._format.format(r(self._lhs), r(self._rhs))
         else:
-            return super().__repr__()
+            return super().__repr_node__(r)
 
 
 class BinaryOpReversible(BinaryOp):
@@ -369,9 +644,7 @@ class BinaryOpReversible(BinaryOp):
 
     def __bool__(self):
         if self.__priority__() == 6:
-            self._lhs.__compared__ = self
-            self._rhs.__compared__ = self
-
+            mark_compared(self, self._lhs, self._rhs)
             return True
 
         return FailedOp("__bool__ is not supported on Op")
@@ -380,65 +653,226 @@ class BinaryOpReversible(BinaryOp):
         return (new_class or self.__class__)(self._priority, fn(self._lhs), fn(self._rhs), self._op, self._format,
                                              self._reversed)
 
-    def __clear__compared___(self):
-        del self._lhs.__compared__
-        del self._rhs.__compared__
-
 
 class ChainCompareOp(Op):
-    def __init__(self, _obj, _lhs: Op, _rhs: Op):
+    __eager__ = False  # the right hand side is only evaluated if the left comparison holds
+
+    def __init__(self, _lhs, _obj, _rhs, _ops):
         super().__init__(_priority=6)
-        _lhs.__clear__compared___()
+        self._lhs = _lhs
         self._obj = _obj
-        self._parameter = ParameterOp(_name='chain_op_parameter' + str(id(self)))
-        self._lhs = _lhs.__transform__(lambda x: self._parameter if self._obj is x else x)
-        self._rhs = _rhs.__transform__(lambda x: self._parameter if self._obj is x else x)
+        self._rhs = _rhs
+        self._ops: tuple[tuple[Callable, str], tuple[Callable, str]] = _ops
 
-    def __invoke__(self, *args, **kwargs):
-        obj = self._obj.__invoke__(*args, **kwargs)
+    def __eval__(self, frame):
+        (lop, _), (rop, _) = self._ops
+
+        lhs = yield self._lhs
+        if isinstance(lhs, FailedOp):
+            return lhs
+        obj = yield self._obj
         if isinstance(obj, FailedOp):
             return obj
 
-        lhs = self._lhs.__invoke__(*args, **kwargs, **{self._parameter._name: obj})
+        r = lop(lhs, obj)
+        if _chain_truth(r) is False:
+            return r
+
+        rhs = yield self._rhs
+        if isinstance(rhs, FailedOp):
+            return rhs
+
+        return rop(obj, rhs)
+
+    def __compile__(self, c):
+        (lop, _), (rop, _) = self._ops
+        lhs, obj, rhs = c(self._lhs), c(self._obj), c(self._rhs)
+
+        def f(args, kwargs, memo):
+            l = lhs(args, kwargs, memo)
+            o = obj(args, kwargs, memo)
+            r = lop(l, o)
+            if _chain_truth(r) is False:
+                return r
+            if isinstance(r := rop(o, rhs(args, kwargs, memo)), FailedOp):
+                raise r
+            return r
+
+        return f
+
+    def __batch__(self, batch):
+        (lop, _), (rop, _) = self._ops
+
+        lhs = batch.eval(self._lhs)
         if isinstance(lhs, FailedOp):
             return lhs
-        if bool(lhs) is False:
-            return lhs
+        obj = batch.eval(self._obj)
+        if isinstance(obj, FailedOp):
+            return obj
+        rhs = batch.eval(self._rhs)
+        if isinstance(rhs, FailedOp):
+            return rhs
 
-        return self._rhs.__invoke__(*args, **kwargs, **{self._parameter._name: obj})
+        return np.logical_and(lop(lhs, obj), rop(obj, rhs))
 
-    def __repr__(self):
-        lhs = repr(self._lhs if self._lhs._rhs is self._parameter else self._lhs.__reverse__())
-        rhs = repr(self._rhs if self._rhs._lhs is self._parameter else self._rhs.__reverse__())
-        param = repr(self._parameter)
-
-        return lhs.split(param)[0] + repr(self._obj) + rhs.split(param)[1]
+    def __repr_node__(self, r):
+        (_, lf), (_, rf) = self._ops
+        return f"{repr_inner(self, self._lhs, r)} {lf} {repr_inner(self, self._obj, r)} {rf} " \
+               f"{repr_inner(self, self._rhs, r)}"
 
     def __visit_operands__(self, fn):
-        r, c = fn(self._obj)
-        if not c: return r
         r, c = fn(self._lhs)
         if not c: return r
+        r, c = fn(self._obj)
+        if not c: return r
         r, c = fn(self._rhs)
         return r
 
+    def __is_foldable__(self):
+        return self._lhs.__is_const__() and self._obj.__is_const__() and self._rhs.__is_const__()
+
+    def __key__(self, key):
+        return ChainCompareOp, self._ops, key(self._lhs), key(self._obj), key(self._rhs)
+
     def __transform__(self, fn=lambda x: x, new_class=None):
-        return (new_class or ChainCompareOp)(fn(self._obj), fn(self._lhs), fn(self._rhs))
+        return (new_class or ChainCompareOp)(fn(self._lhs), fn(self._obj), fn(self._rhs), self._ops)
+
+
+def chain_compare(obj: Op, lhs: BinaryOpReversible, rhs: BinaryOpReversible):
+    """Joins `lhs` (a comparison with `obj` on either side) and `rhs` (a comparison with `obj` on the left)
+    captured from a chained comparison such as `a < obj < b`"""
+    if lhs._rhs is not obj:
+        lhs = lhs.__reverse__()
+
+    return ChainCompareOp(lhs._lhs, obj, rhs._rhs, ((lhs._op, lhs._format), (rhs._op, rhs._format)))
+
+
+_pending = threading.local()
+
+# a chain abandoned half way (`a < b > c` joins nothing) leaves its comparison behind, only the latest few are kept
+_MAX_PENDING = 8
+
+
+def _pending_comparisons():
+    if (r := getattr(_pending, 'comparisons', None)) is None:
+        r = _pending.comparisons = []
+    return r
+
+
+@functools.lru_cache(maxsize=1024)
+def _is_chain_link(code, offset):
+    # whether the instruction at offset tests the truth of a comparison in a chain such as `a < b < c`: the middle
+    # operand is copied for the next comparison right ahead of it, unlike in `if a < b:` or `assert a < b`
+    instructions = [i for i in dis.get_instructions(code) if i.offset <= offset]
+    while instructions and instructions[-1].opname != 'COMPARE_OP':
+        i = instructions.pop()
+        if i.opname not in ('COPY', 'TO_BOOL') and 'JUMP' not in i.opname:
+            return False
+    return len(instructions) > 1 and instructions[-2].opname == 'COPY' and instructions[-2].arg == 2
+
+
+def _detects_chain_links():
+    # whether _is_chain_link tells the truth test of a chain from other truth tests in the bytecode of this
+    # interpreter, by testing both
+    seen = []
+
+    class Probe:
+        def __lt__(self, other):
+            return self
+
+        def __bool__(self):
+            frame = sys._getframe(1)
+            seen.append(_is_chain_link(frame.f_code, frame.f_lasti))
+            return True
+
+    probe = Probe()
+    try:
+        probe < probe < probe
+        if probe < probe:
+            pass
+    except Exception:
+        return False
+    return seen == [True, False]
+
+
+# otherwise every comparison tested for truth is recorded, and one tested by `if` or `assert` can be joined by the
+# next comparison of one of its operands
+_CHAIN_LINKS_DETECTED = _detects_chain_links()
+
+
+def _chain_truth(value):
+    # bool(value) for the left comparison of a chain evaluated by hand, recorded as a python chain would record it
+    _pending.chain_link = True
+    try:
+        return bool(value)
+    finally:
+        _pending.chain_link = False
+
+
+def _weak_ref(o):
+    try:
+        return weakref.ref(o)
+    except TypeError:
+        return None  # a constant operand does not continue a chain
+
+
+def mark_compared(comparison, *operands):
+    """Records that `comparison` was tested for truth by a chained comparison such as `a < b < c`, as Python does
+    with each comparison of the chain but the last one, so that the next comparison of one of its operands can join
+    it. Called from `__bool__`, comparisons tested anywhere else (`if a < b:`, `assert a < b`) are not recorded.
+    Pending comparisons are kept per thread, so concurrent chains do not see each other's."""
+    if _CHAIN_LINKS_DETECTED and not getattr(_pending, 'chain_link', False):
+        frame = sys._getframe(2)
+        if not _is_chain_link(frame.f_code, frame.f_lasti):
+            return
+    pending = _pending_comparisons()
+    pending.append((comparison, [r for o in operands if (r := _weak_ref(o)) is not None]))
+    del pending[:-_MAX_PENDING]
+
+
+def _find_compared(pending, operand):
+    for i in range(len(pending) - 1, -1, -1):
+        if any(r() is operand for r in pending[i][1]):
+            return i
+    return None
+
+
+def is_compared(operand):
+    return _find_compared(_pending_comparisons(), operand) is not None
+
+
+def pop_compared(operand):
+    """Returns the comparison recorded for `operand` by `mark_compared` or None, and clears it along with the
+    comparisons recorded after it, which belong to chains nested in it that did not continue"""
+    pending = _pending_comparisons()
+    if (i := _find_compared(pending, operand)) is None:
+        return None
+    comparison = pending[i][0]
+    del pending[i:]
+    return comparison
 
 
 class Item:
+    # the ConstOp wrapping the item, so that a chained comparison such as `_0 < item < _1` started on the Op
+    # can be continued by the item
     __expression__ = None
 
+    def __getstate__(self):
+        # the link to the ConstOp wrapping the item is restored when that ConstOp is loaded
+        state = self.__dict__.copy()
+        state.pop('__expression__', None)
+        return state
+
 
 class GetitemOp(BinaryOpSpecial):
     def __init__(self, _obj: Op, _item):
         super().__init__(_priority=16, _lhs=_obj, _rhs=_item, _op=operator.getitem, _format="{}[{}]")
 
-    def __invoke__(self, *args, **kwargs):
-        lhs = self._lhs.__invoke__(*args, **kwargs)
+    def __eval__(self, frame):
+        lhs = yield self._lhs
         if isinstance(lhs, FailedOp):
             return lhs
-        rhs = self._rhs.__invoke__(*args, **kwargs)
+        rhs = yield self._rhs
         if isinstance(rhs, FailedOp):
             return rhs
 
@@ -457,49 +891,86 @@ class CallOp(Op):
         self._args = args
         self._kwargs = kwargs
 
-    def __repr__(self):
+    def __repr_node__(self, r):
         args = ', '.join(
             itertools.chain(
-                (repr(a) for a in self._args),
-                (f'{k}={v}' for k, v in self._kwargs)))
+                (r(a) for a in self._args),
+                (f'{k}={r(v) if isinstance(v, Op) else v}' for k, v in self._kwargs.items())))
 
-        return f"{repr_inner(self, self._fn)}({args})"
+        return f"{repr_inner(self, self._fn, r)}({args})"
 
-    def __invoke__(self, *args, **kwargs):
+    def __eval__(self, frame):
         call_args = []
         for a in self._args:
-            a = a.__invoke__(*args, **kwargs) if isinstance(a, Op) else a
+            a = (yield a) if isinstance(a, Op) else a
             if isinstance(a, FailedOp):
                 return a
             call_args.append(a)
 
         call_kwargs = {}
-        for k, v in self._kwargs:
-            v = v.__invoke__(*args, **kwargs) if isinstance(v, Op) else v
+        for k, v in self._kwargs.items():
+            v = (yield v) if isinstance(v, Op) else v
             if isinstance(v, FailedOp):
                 return v
             call_kwargs[k] = v
 
-        fn: Callable = self._fn.__invoke__(*args, **kwargs)
+        fn: Callable = yield self._fn
         if isinstance(fn, FailedOp):
             return fn
 
         if any(isinstance(a, Op) for a in call_args) or any(isinstance(v, Op) for v in call_kwargs.values()):
             return CallOp(fn, call_args, call_kwargs)
 
+        if isinstance(self._fn, ConstOp) and (cache := self._fn._cache) is not None:
+            return cache.call(fn, call_args, call_kwargs)
+
         return fn(*call_args, **call_kwargs)
 
+    def __compile__(self, c):
+        def compile_arg(a):
+            if isinstance(a, Op):
+                return c(a)
+            return lambda args, kwargs, memo: a
+
+        fn = c(self._fn)
+        call_args = tuple(compile_arg(a) for a in self._args)
+        call_kwargs = tuple((k, compile_arg(v)) for k, v in self._kwargs.items())
+        cache = self._fn._cache if isinstance(self._fn, ConstOp) else None
+
+        def f(args, kwargs, memo):
+            a = [x(args, kwargs, memo) for x in call_args]
+            kw = {k: x(args, kwargs, memo) for k, x in call_kwargs}
+            fn_ = fn(args, kwargs, memo)
+            if any(isinstance(v, Op) for v in a) or any(isinstance(v, Op) for v in kw.values()):
+                return CallOp(fn_, a, kw)
+
+            r = fn_(*a, **kw) if cache is None else cache.call(fn_, a, kw)
+            if isinstance(r, FailedOp):
+                raise r
+            return r
+
+        return f
+
     def __visit_operands__(self, fn):
         r, c = fn(self._fn)
         if not c: return r
         for a in self._args:
             r, c = fn(a)
             if not c: return r
-        for _, a in self._kwargs:
+        for _, a in self._kwargs.items():
             r, c = fn(a)
             if not c: return r
         return r
 
+    def __is_foldable__(self):
+        return isinstance(self._fn, ConstOp) and self._fn._pure \
+            and all(a.__is_const__() for a in self._args if isinstance(a, Op)) \
+            and all(v.__is_const__() for v in self._kwargs.values() if isinstance(v, Op))
+
+    def __key__(self, key):
+        return (type(self), key(self._fn), tuple(key(a) for a in self._args),
+                tuple((k, key(v)) for k, v in self._kwargs.items()))
+
     def __transform__(self, fn=lambda x: x, new_class=None):
         return (new_class or self.__class__)(fn(self._fn), tuple(fn(a) for a in self._args),
                                              {k: fn(v) for k, v in self._kwargs.items()})
@@ -518,15 +989,15 @@ class IterOp(Op):
         self._exhausted = True
         return self
 
-    def __invoke__(self, *args, **kwargs):
-        obj = self._obj.__invoke__(*args, **kwargs)
+    def __eval__(self, frame):
+        obj = yield self._obj
         if isinstance(obj, FailedOp):
             return obj
 
         return Iterator(obj)
 
-    def __repr__(self):
-        return f"iter({repr(self._obj)})"
+    def __repr_node__(self, r):
+        return f"iter({r(self._obj)})"
 
     def __visit_operands__(self, fn):
         r, c = fn(self._obj)
@@ -537,30 +1008,20 @@ class IterOp(Op):
 
 
 class Iterator(Op):
+    # the source of a comprehension iterator, possibly depending on outer iterators. Evaluates to a new python
+    # iterator every time, so nothing of an evaluation is kept on the node
     def __init__(self, _obj):
         super().__init__(19)
         self._obj = _obj
-        self._iter = None
-
-    def __invoke__(self, *args, **kwargs):
-        if self._iter is None:
-            obj = self._obj if not isinstance(self._obj, Op) else self._obj.__invoke__(*args, **kwargs)
-            if isinstance(obj, FailedOp):
-                return obj
-            self._iter = iter(obj)
 
-    def __iter__(self):
-        return self
-
-    def __next__(self):
-        r = next(self._iter, StopIteration())
-        if isinstance(r, StopIteration):
-            self._iter = None
-            raise r
-        return r
+    def __eval__(self, frame):
+        obj = self._obj if not isinstance(self._obj, Op) else (yield self._obj)
+        if isinstance(obj, FailedOp):
+            return obj
+        return iter(obj)
 
-    def __repr__(self):
-        return f"next({repr(self._obj)})"
+    def __repr_node__(self, r):
+        return f"next({r(self._obj)})"
 
     def __visit_operands__(self, fn):
         r, c = fn(self._obj)
@@ -577,72 +1038,136 @@ class ParameterOp(Op):
         self._name = _name
         self._type = _type
 
-    def __repr__(self):
+    def __repr_node__(self, r):
         return self._name if self._name else f"_{self._index}"
 
-    def __invoke__(self, *args, **kwargs):
-        if self._name is not None and self._name in kwargs:
-            return kwargs[self._name]
-        elif self._index is not None and len(args) > self._index:
-            return args[self._index]
+    def __eval__(self, frame):
+        if self._name is not None and self._name in frame.kwargs:
+            return frame.kwargs[self._name]
+        elif self._index is not None and len(frame.args) > self._index:
+            return frame.args[self._index]
         else:
             return FailedOp(f"missing argument with {'name ' + self._name if self._name else ''}"
                             f"{' or ' if self._name and self._index is not None else ''}"
                             f"{'index ' + str(self._index) if self._index is not None else ''}")
 
+    def __compile__(self, c):
+        name, index, failed = self._name, self._index, self.__invoke__
+
+        if name is not None and index is not None:
+            def f(args, kwargs, memo):
+                if name in kwargs:
+                    return kwargs[name]
+                if len(args) > index:
+                    return args[index]
+                raise failed()
+        elif index is not None:
+            def f(args, kwargs, memo):
+                if len(args) > index:
+                    return args[index]
+                raise failed()
+        elif name is not None:
+            def f(args, kwargs, memo):
+                if name in kwargs:
+                    return kwargs[name]
+                raise failed()
+        else:
+            def f(args, kwargs, memo):
+                raise failed()
+
+        return f
+
+    def __batch__(self, batch):
+        return self.__eval__(batch)
+
     def __visit_operands__(self, fn):
         return None
 
+    def __key__(self, key):
+        return type(self), self._index, self._name, self._type
+
     def __transform__(self, fn=lambda x: x, new_class=None):
         return (new_class or self.__class__)(_index=self._index, _name=self._name, _type=self._type)
 
 
 class SequenceOp(Op):
-    def __init__(self, _items):
+    def __init__(self, _items, _tp=None):
         super().__init__(_priority=17)
-        self._tp = type(_items)
-        self._items = [make_op(a) for a in _items] if self._tp is not dict \
-            else [KeyValueOp(i) for i in _items.items()]
+        if _tp is not None:  # already made items, e.g. when transformed
+            self._tp = _tp
+            self._items = list(_items)
+        else:
+            self._tp = type(_items)
+            self._items = [make_op(a) for a in _items] if self._tp is not dict \
+                else [KeyValueOp(i) for i in _items.items()]
 
-    def __repr__(self):
+    def __repr_node__(self, r):
         f = "({})" if self._tp is tuple else "[{}]" if self._tp is list else "{{{}}}"
-        return f.format(', '.join(repr(i) for i in self._items))
+        return f.format(', '.join(r(i) for i in self._items))
+
+    def _comprehensions(self):
+        # the items iterating over IterOps as ComprehensionOps, None for the others, cached on the node so the
+        # comprehensions keep their plans between calls
+        if (r := getattr(self, '__comprehensions__', None)) is None:
+            r = self.__comprehensions__ = tuple(
+                ComprehensionOp(self._tp, i) if find_op(i, IterOp, skip=ComprehensionOp) else None for i in self._items)
+        return r
 
-    def __invoke__(self, *args, **kwargs):
+    def __eval__(self, frame):
         items = []
-        for i in self._items:
-            if find_op(i, IterOp, skip=ComprehensionOp):
-                i = ComprehensionOp(self._tp, i)
-                r = i.__invoke__(*args, **kwargs)
+        for i, c in zip(self._items, self._comprehensions()):
+            if c is not None:
+                r = yield c
+                if isinstance(r, FailedOp):
+                    return r
                 if any(isinstance(f := x, FailedOp) for x in r):
                     return f
                 items.extend(r if not self._tp is dict else r.items())
             else:
-                r = i.__invoke__(*args, **kwargs)
+                r = yield i
                 if isinstance(r, FailedOp):
                     return r
                 items.append(r)
 
         return self._tp(items) if not any(isinstance(i, Op) for i in items) else SequenceOp(items)
 
+    def __compile__(self, c):
+        if any(find_op(i, IterOp, skip=ComprehensionOp) for i in self._items):
+            return super().__compile__(c)
+
+        tp, items = self._tp, tuple(c(i) for i in self._items)
+
+        def f(args, kwargs, memo):
+            r = [i(args, kwargs, memo) for i in items]
+            return tp(r) if not any(isinstance(i, Op) for i in r) else SequenceOp(r)
+
+        return f
+
     def __visit_operands__(self, fn):
+        r = None
         for i in self._items:
             r, c = fn(i)
             if not c:
                 return r
         return r
 
+    def __is_foldable__(self):
+        return all(i.__is_const__() for i in self._items)
+
+    def __key__(self, key):
+        return type(self), self._tp, tuple(key(i) for i in self._items)
+
     def __transform__(self, fn=lambda x: x, new_class=None):
-        return (new_class or self.__class__)(self._tp(fn(i) for i in self._items))
+        return (new_class or self.__class__)([fn(i) for i in self._items], _tp=self._tp)
 
 
 class KeyValueOp(SequenceOp):
-    def __init__(self, _items):
+    def __init__(self, _items, _tp=None):
         assert len(_items) == 2
-        super().__init__(_items)
+        super().__init__(_items, _tp)
 
-    def __repr__(self):
-        return f"{repr(self._items[0])}: {repr(self._items[1])}"
+    def __repr_node__(self, r):
+        return f"{r(self._items[0])}: {r(self._items[1])}"
 
 
 class ComprehensionOp(Op):
@@ -651,43 +1176,278 @@ class ComprehensionOp(Op):
         self._tp = _tp
         self._item = _item
 
-    def __repr__(self):
+    def __repr_node__(self, r):
         layers, iterators = find_iterators(self._item, tp=IterOp)
         iterators = {it: ParameterOp(_name="ijklmn"[i]) for i, it in enumerate(iterators)}
-        item = replace(self._item, iterators)
-        f = "{{{} {}}}" if self._tp is dict and isinstance(self._item, KeyValueOp) else "[{} {}]" if self._tp is list else "tuple({})"
-        return f.format(repr(item), ' '.join(f"for {iterators[i]._name} in {repr(i)}" for i in iterators))
-
-    def __invoke__(self, *args, **kwargs):
-        return self._tp(i for i in self._generate(self._item, *args, **kwargs))
+        item, conditions = _split_where(replace(self._item, iterators))
+        f = "{{{} {}}}" if self._tp is dict and isinstance(item, KeyValueOp) else "[{} {}]" if self._tp is list \
+            else "({} {})" if self._tp is types.GeneratorType else "tuple({} {})"
+        return f.format(repr(item), ' '.join(itertools.chain(
+            (f"for {iterators[i]._name} in {r(i)}" for i in iterators), (f"if {repr(c)}" for c in conditions))))
+
+    def __eval__(self, frame):
+        item, bindings = self._bindings(frame.args, frame.kwargs)
+        if self._tp is types.GeneratorType:  # evaluated as it is iterated, failures are raised
+            return (item.__invoke__(*frame.args, **values) for values in bindings)
+        try:
+            return self._tp([item.__invoke__(*frame.args, **values) for values in bindings])
+        except FailedOp as r:
+            return r
 
     def __visit_operands__(self, fn):
         r, c = fn(self._item)
         return r
 
+    def __key__(self, key):
+        # iterators are bound variables of the comprehension, so they are numbered in order of appearance
+        # rather than keyed by identity
+        keys, sources = {}, []
+
+        def k(x):
+            return keys[id(x)] if isinstance(x, Op) else key(x)
+
+        # nested comprehensions key their own items
+        for x in _postorder(self._item, lambda x: not isinstance(x, ComprehensionOp)):
+            if isinstance(x, IterOp):
+                keys[id(x)] = IterOp, len(sources)
+                sources.append(k(x._obj))
+            else:
+                keys[id(x)] = x.__key__(k)
+        return type(self), self._tp, k(self._item), tuple(sources)
+
     def __transform__(self, fn=lambda x: x, new_class=None):
         return (new_class or self.__class__)(self._tp, fn(self._item))
 
-    @staticmethod
-    def _generate(expr, *args, **kwargs):
-        layers, iterators = find_iterators(expr, tp=IterOp)
-        assert len(iterators) <= 6, "Comprehensions with more than 6 iterators are not supported"
-        iterators = {it: ParameterOp(_name="ijklmn"[i]) for i, it in enumerate(iterators)}
-        replacer = lambda x: y if ((y := iterators.get(x, None) if isinstance(x, Op) else x) is not None
-                                   ) else x.__transform__(replacer)
-        expr = replacer(expr)
+    def _plan(self):
+        # the item with the iterators replaced by parameters, the conditions that do not depend on any iterator,
+        # and the layers of the iterators from the outermost. A layer is a tuple of (parameter name, source,
+        # conditions) triples, the conditions being those that can be tested once the iterator is bound. Sources
+        # of inner layers refer to the parameters of the outer ones. Computed once and cached on the node
+        if (plan := getattr(self, '__plan__', None)) is None:
+            layers, iterators = find_iterators(self._item, tp=IterOp)
+            position = {id(it): n for n, it in enumerate(i for layer in reversed(layers) for i in layer)}
+            # names that can not clash with keyword arguments of calc, as the item is evaluated with them too
+            parameters = {it: ParameterOp(_name=f'#{position[id(it)]}') for it in iterators}
+            item, conditions = _split_where(self._item)
+
+            # each condition is tested as soon as the last of the iterators it uses is bound
+            tested = defaultdict(list)
+            for c in conditions:
+                used = [position[id(x)] for x in _postorder(c) if isinstance(x, IterOp)]
+                tested[max(used, default=-1)].append(replace(c, parameters))
+
+            layers = tuple(tuple((parameters[i]._name, replace(i._obj, parameters), tuple(tested[position[id(i)]]))
+                                 for i in layer) for layer in reversed(layers))
+            plan = self.__plan__ = (replace(item, parameters), tuple(tested[-1]), layers)
+        return plan
+
+    def _bindings(self, args, kwargs):
+        # the item to evaluate and an iterator of the keyword arguments to evaluate it with, for every combination
+        # of the iterator values that passes the conditions. Combinations are built by binding the outer iterators
+        # first, so those rejected by a condition on outer iterators are never expanded further. Raises FailedOp
+        # if a source or a condition fails
+        item, conditions, layers = self._plan()
+
+        def holds(conditions, values):
+            for c in conditions:
+                if isinstance(r := c.__invoke__(*args, **values), FailedOp):
+                    raise r
+                if not r:
+                    return False
+            return True
+
+        def bind(n, values):
+            if n == len(layers):
+                yield values
+                return
+
+            sources = [s.__invoke__(*args, **values) for _, s, _ in layers[n]]
+            if any(isinstance(f := x, FailedOp) for x in sources):
+                raise f
+            # all but the first iterator of a layer are iterated once for each value of the previous ones
+            sources[1:] = [list(s) for s in sources[1:]]
+
+            def product(k, values):
+                if k == len(sources):
+                    yield from bind(n + 1, values)
+                    return
+                name, _, conditions = layers[n][k]
+                for v in sources[k]:
+                    if holds(conditions, b := {**values, name: v}):
+                        yield from product(k + 1, b)
+
+            yield from product(0, values)
+
+        return item, (bind(0, kwargs) if holds(conditions, kwargs) else iter(()))
+
+
+class WhereOp(Op):
+    def __init__(self, _item, _cond):
+        super().__init__(_priority=16)
+        self._item = _item
+        self._cond = _cond
+
+    def __repr_node__(self, r):
+        return f"where({r(self._item)}, {r(self._cond)})"
+
+    def __eval__(self, frame):
+        # outside of a comprehension, the item if the condition holds
+        cond = yield self._cond
+        if isinstance(cond, FailedOp):
+            return cond
+        if not cond:
+            return FailedOp(f"condition of {repr(self)} does not hold")
+        return (yield self._item)
+
+    def __visit_operands__(self, fn):
+        r, c = fn(self._item)
+        if not c: return r
+        r, c = fn(self._cond)
+        return r
+
+    def __key__(self, key):
+        return type(self), key(self._item), key(self._cond)
+
+    def __transform__(self, fn=lambda x: x, new_class=None):
+        return (new_class or self.__class__)(fn(self._item), fn(self._cond))
+
+
+class ShortCircuitOp(Op):
+    # and_, or_ and coalesce, evaluating the items in order until one decides the value
+    __eager__ = False
+
+    def __init__(self, _name, _items):
+        super().__init__(_priority=16)
+        if not _items:
+            raise ValueError(f'{_name} needs at least one item')
+        self._name: str = _name
+        self._items: tuple = tuple(make_op(i) for i in _items)
+
+    def __repr_node__(self, r):
+        return f"{self._name}({', '.join(r(i) for i in self._items)})"
+
+    def __eval__(self, frame):
+        name = self._name
+        for item in self._items:
+            value = yield item
+            if name == 'coalesce':
+                if value is not None and not isinstance(value, FailedOp):
+                    return value
+            elif isinstance(value, FailedOp) or bool(value) is (name == 'or_'):
+                return value
+        return value
+
+    def __compile__(self, c):
+        items = tuple(c(i) for i in self._items)
+        *first, last = items
+
+        if self._name == 'and_':
+            def f(args, kwargs, memo):
+                for x in first:
+                    if not (v := x(args, kwargs, memo)):
+                        return v
+                return last(args, kwargs, memo)
+        elif self._name == 'or_':
+            def f(args, kwargs, memo):
+                for x in first:
+                    if v := x(args, kwargs, memo):
+                        return v
+                return last(args, kwargs, memo)
+        else:
+            def f(args, kwargs, memo):
+                for x in first:
+                    try:
+                        v = x(args, kwargs, memo)
+                    except FailedOp:
+                        continue
+                    if v is not None:
+                        return v
+                return last(args, kwargs, memo)
+
+        return f
+
+    def __visit_operands__(self, fn):
+        r = None
+        for i in self._items:
+            r, c = fn(i)
+            if not c: return r
+        return r
+
+    def __is_foldable__(self):
+        return all(i.__is_const__() for i in self._items)
+
+    def __key__(self, key):
+        return type(self), self._name, tuple(key(i) for i in self._items)
+
+    def __transform__(self, fn=lambda x: x, new_class=None):
+        return (new_class or self.__class__)(self._name, tuple(fn(i) for i in self._items))
+
+
+class IfOp(Op):
+    __eager__ = False  # only the chosen branch is evaluated
+
+    def __init__(self, _cond, _then, _else):
+        super().__init__(_priority=16)
+        self._cond = _cond
+        self._then = _then
+        self._else = _else
+
+    def __repr_node__(self, r):
+        return f"if_({r(self._cond)}, {r(self._then)}, {r(self._else)})"
+
+    def __eval__(self, frame):
+        cond = yield self._cond
+        if isinstance(cond, FailedOp):
+            return cond
+        return (yield self._then if cond else self._else)
+
+    def __compile__(self, c):
+        cond, then, else_ = c(self._cond), c(self._then), c(self._else)
+        return lambda args, kwargs, memo: \
+            then(args, kwargs, memo) if cond(args, kwargs, memo) else else_(args, kwargs, memo)
+
+    def __visit_operands__(self, fn):
+        r, c = fn(self._cond)
+        if not c: return r
+        r, c = fn(self._then)
+        if not c: return r
+        r, c = fn(self._else)
+        return r
+
+    def __optimize__(self, fn):
+        op = _rebuild(self, fn)
+        if isinstance(op._cond, ConstOp) and not isinstance(op._cond._value, Item):
+            return op._then if op._cond._value else op._else
+        return op
+
+    def __key__(self, key):
+        return type(self), key(self._cond), key(self._then), key(self._else)
+
+    def __transform__(self, fn=lambda x: x, new_class=None):
+        return (new_class or self.__class__)(fn(self._cond), fn(self._then), fn(self._else))
+
 
-        def gen(remaining_layers):
-            ti = {iterators[i]._name: i.__transform__(replacer) for i in remaining_layers[0]}
-            ti = {n: i.__invoke__(*args, **kwargs, **{it._name: it for it in iterators.values()}) for n, i in ti.items()}
-            for values in (gen(remaining_layers[1:]) if len(remaining_layers) > 1 else [{}]):
-                for k, v in ti.items():
-                    v.__invoke__(**values)
-                for vals in itertools.product(*ti.values()):
-                    yield {**values, **{k: v for k, v in zip(ti.keys(), vals)}}
+def _split_where(item):
+    # the item of a comprehension without its where clauses, and their conditions split on &
+    conditions, pending = [], []
 
-        for values in gen(layers):
-            yield expr.__invoke__(**values)
+    def unwrap(x):
+        while isinstance(x, WhereOp):
+            pending.append(x._cond)
+            x = x._item
+        return x
+
+    item = unwrap(item)
+    if isinstance(item, KeyValueOp) and any(isinstance(i, WhereOp) for i in item._items):
+        item = KeyValueOp([unwrap(i) for i in item._items], _tp=item._tp)
+
+    while pending:
+        c = pending.pop()
+        if type(c) is BinaryOp and c._op is operator.and_:
+            pending.extend((c._rhs, c._lhs))
+        else:
+            conditions.append(c)
+    return item, conditions
 
 
 class FailedOp(Exception):
@@ -699,44 +1459,81 @@ class FailedOp(Exception):
         return f"Failure: {self._message}" + (f", caused by {self._cause}" if self._cause else "")
 
 
-def repr_inner(outer_op, inner_op):
+def repr_inner(outer_op, inner_op, r=repr):
     if outer_op.__priority__() > inner_op.__priority__():
-        return f"({repr(inner_op)})"
-    return repr(inner_op)
+        return f"({r(inner_op)})"
+    return r(inner_op)
+
+
+def _operands(op):
+    # the Op operands of op, in order
+    operands = []
+
+    def f(x):
+        if isinstance(x, Op):
+            operands.append(x)
+        return None, True
+
+    op.__visit_operands__(f)
+    return operands
+
+
+def _postorder(op, expand=lambda x: True):
+    # yields each distinct node of the tree once, operands before the nodes using them, without recursion.
+    # Operands of nodes for which expand returns False are not visited
+    done = set()
+    stack = [(op, False)]
+    while stack:
+        x, ready = stack.pop()
+        if id(x) in done:
+            continue
+        if ready or not expand(x):
+            done.add(id(x))
+            yield x
+        else:
+            stack.append((x, True))
+            stack.extend((o, False) for o in reversed(_operands(x)) if id(o) not in done)
 
 
 def find_op(op, tp, skip=None):
-    def f(op):
-        if isinstance(op, Op):
-            if skip and isinstance(op, skip):
-                return False, True
-            if isinstance(op, tp):
-                return True, False
-            found = op.__visit_operands__(f)
-            return found, not found
-        return False, True
-
-    return f(op)[0]
+    if not isinstance(op, Op):
+        return False
+    seen, stack = set(), [op]
+    while stack:
+        x = stack.pop()
+        if skip and isinstance(x, skip):
+            continue
+        if isinstance(x, tp):
+            return True
+        for o in _operands(x):
+            if id(o) not in seen:
+                seen.add(id(o))
+                stack.append(o)
+    return False
 
 
 def find_iterators(op, tp=Iterator):
-    iterators = defaultdict(list)
-    stack = []
+    # each node is visited once, so trees sharing subtrees are walked in time linear in their distinct nodes
+    iterators, seen = {}, set()
+    stack = [op] if isinstance(op, Op) else []
+    while stack:  # the iterators in order of appearance
+        x = stack.pop()
+        if id(x) not in seen:
+            seen.add(id(x))
+            if isinstance(x, tp):
+                iterators[x] = []
+            stack.extend(reversed(_operands(x)))
+
+    within = {}  # the iterators within each node, itself included, by id
+    for x in _postorder(op) if isinstance(op, Op) else ():
+        inner = {}
+        for o in _operands(x):
+            inner.update(within[id(o)])
+        if isinstance(x, tp):
+            iterators[x] = list(inner.values())
+            inner[id(x)] = x
+        within[id(x)] = inner
 
-    def f(op):
-        if isinstance(op, Op):
-            if isinstance(op, tp):
-                stack.append(op)
-                iterators.setdefault(op, [])
-                op.__visit_operands__(f)
-                stack.pop()
-                for i in stack:
-                    iterators[i].append(op)
-            else:
-                op.__visit_operands__(f)
-        return False, True
-
-    f(op)
     layers = [list() for _ in range(max(len(l) for l in iterators.values()) + 1)]
     for i, l in iterators.items():
         layers[-1 - len(l)].append(i)
@@ -744,26 +1541,745 @@ def find_iterators(op, tp=Iterator):
 
 
 def find_parameters(op, tp=ParameterOp):
-    parameters = defaultdict(int)
+    parameters, seen = {}, set()
+    stack = [op] if isinstance(op, Op) else []
+    while stack:
+        x = stack.pop()
+        if id(x) in seen:
+            continue
+        seen.add(id(x))
+        if isinstance(x, tp):
+            parameters[x] = None
+        else:
+            stack.extend(reversed(_operands(x)))
 
-    def f(op):
-        if isinstance(op, Op):
-            if isinstance(op, tp):
-                parameters[op] += 1
+    return tuple(parameters.keys())
+
+
+def _binary(priority, fn, format_):
+    return lambda lhs, rhs: BinaryOp(priority, lhs, rhs, fn, format_)
+
+
+def _comparison(fn, format_, reversed_):
+    return lambda lhs, rhs: BinaryOpReversible(6, lhs, rhs, fn, format_, reversed_)
+
+
+def _unary(priority, fn, format_):
+    return lambda obj: UnaryOp(priority, make_op(obj), fn, format_)
+
+
+# the nodes built by build for each operation and number of operands, as made by the operators of Op
+_BUILDERS = {
+    ('+', 2): _binary(11, operator.add, '+'),
+    ('-', 2): _binary(11, operator.sub, '-'),
+    ('*', 2): _binary(12, operator.mul, '*'),
+    ('/', 2): _binary(12, operator.truediv, '/'),
+    ('//', 2): _binary(12, operator.floordiv, '//'),
+    ('%', 2): _binary(12, operator.mod, '%'),
+    ('**', 2): _binary(14, operator.pow, '**'),
+    ('<<', 2): _binary(10, operator.lshift, '<<'),
+    ('>>', 2): _binary(10, operator.rshift, '>>'),
+    ('&', 2): _binary(9, operator.and_, '&'),
+    ('^', 2): _binary(8, operator.xor, '^'),
+    ('|', 2): _binary(7, operator.or_, '|'),
+    ('==', 2): _binary(6, operator.eq, '=='),
+    ('!=', 2): _binary(6, operator.ne, '!='),
+    ('<', 2): _comparison(operator.lt, '<', _reversed_lt),
+    ('<=', 2): _comparison(operator.le, '<=', _reversed_le),
+    ('>', 2): _comparison(operator.gt, '>', _reversed_gt),
+    ('>=', 2): _comparison(operator.ge, '>=', _reversed_ge),
+    ('-', 1): _unary(13, operator.neg, '-{}'),
+    ('+', 1): _unary(13, operator.pos, '+{}'),
+    ('~', 1): _unary(13, operator.invert, '~{}'),
+    ('abs', 1): _unary(20, operator.abs, 'abs{}'),
+    ('divmod', 2): lambda lhs, rhs: BinaryOpSpecial(-1, lhs, rhs, divmod, "divmod({}, {})"),
+    ('round', 2): lambda obj, n: BinaryOpSpecial(20, obj, n, round, _format="round({}, {})"),
+    ('getitem', 2): GetitemOp,
+    ('where', 2): where,
+}
+_COMPARISONS = {'<': (operator.lt, '<'), '<=': (operator.le, '<='), '>': (operator.gt, '>'),
+                '>=': (operator.ge, '>=')}
+# python evaluates `1 < x` as `x > 1` when only x is an Op
+_REFLECTED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '==', '!=': '!='}
+
+
+def _parse_spec(spec):
+    # the operation, operands and keyword operands of a build spec
+    if type(spec) is not dict:
+        if not spec or not isinstance(spec[0], str):
+            raise ValueError(f'a spec {type(spec).__name__} starts with the name of the operation, got {spec!r}')
+        return spec[0], spec[1:], None
+    if 'op' not in spec or not set(spec) <= {'op', 'args', 'kwargs'}:
+        raise ValueError(f"a spec dict has an 'op' and optionally 'args' and 'kwargs', got {spec!r}")
+    return spec['op'], tuple(spec.get('args', ())), spec.get('kwargs')
+
+
+def build(spec, functions: Mapping = None, lists: bool = False):
+    """Builds an expression from a description made of tuples `(operation, *operands)` or dicts
+    `{'op': operation, 'args': [operands], 'kwargs': {name: operand}}`, calling the node constructors directly
+    instead of going through the operators, e.g. `build(('+', ('getattr', ('param', 0), 'x'), 1))` is `_0.x + 1`.
+
+    Operations are the operators of python by their symbol (`'-'` with one operand is negation), `'abs'`,
+    `'divmod'`, `'round'`, `'getitem'`, `'where'`, comparisons of three operands for chained comparisons such
+    as `('<', 0, ('param', 0), 10)`, `'and'`, `'or'`, `'coalesce'` and `('if', condition, then, else)` for the
+    nodes evaluating only the operands needed, and:
+      - `('param', index)`, `('param', name)` or `('param', index, name)` for parameters
+      - `('getattr', obj, name)` for attributes
+      - `('call', fn, *args)`, with keyword arguments in the dict form. A string `fn` names one of `functions`
+      - `('const', value)` for a value that is not built, e.g. a tuple
+    Other values are constants, as for the operators. A spec object used several times builds a single node.
+
+    With `lists=True` lists are specs too, as tuples are, so that specs loaded from JSON, where arrays load as
+    lists, can use either form: `build(json.loads('["+", ["param", 0], 1]'), lists=True)` is `_0 + 1`. Constant
+    lists are then written `["const", [...]]`."""
+    functions = functions or {}
+    built = {}  # id of spec: node
+    specs = (tuple, dict, list) if lists else (tuple, dict)
+
+    def operand(x):
+        t = type(x)
+        if t in specs:
+            return built[id(x)]
+        return x if t is int or t is float or t is str or t is bool else make_op(x)
+
+    # a spec is pushed with its parsed form once its operands are pushed, and built when popped again
+    stack = [(spec, None)]
+    while stack:
+        x, parsed = stack.pop()
+        if parsed is None:
+            if id(x) in built or type(x) not in specs:
+                continue
+            name, operands, kwargs = parsed = _parse_spec(x)
+            if name == 'const':
+                built[id(x)] = ConstOp(*operands)
+            elif name == 'param':
+                built[id(x)] = ParameterOp(_index=next((o for o in operands if isinstance(o, int)), None),
+                                           _name=next((o for o in operands if isinstance(o, str)), None))
             else:
-                op.__visit_operands__(f)
-        return False, True
+                stack.append((x, parsed))
+                stack.extend((o, None) for o in operands if type(o) in specs)
+                if kwargs:
+                    stack.extend((o, None) for o in kwargs.values() if type(o) in specs)
+            continue
+
+        name, operands, kwargs = parsed
+        if name == 'getattr':
+            obj, attr = operands
+            node = GetattrOp(make_op(operand(obj)), attr)
+        elif name == 'call':
+            fn, *args = operands
+            if isinstance(fn, str):
+                if fn not in functions:
+                    raise ValueError(f'unknown function {fn!r} in {x!r}')
+                fn = functions[fn]
+            node = CallOp(operand(fn), [operand(a) for a in args],
+                          {k: operand(v) for k, v in kwargs.items()} if kwargs else {})
+        elif name in ('and', 'or', 'coalesce') and operands:
+            node = ShortCircuitOp(name if name == 'coalesce' else name + '_', [operand(o) for o in operands])
+        elif name == 'if' and len(operands) == 3:
+            node = IfOp(*(make_op(operand(o)) for o in operands))
+        elif name in _COMPARISONS and len(operands) == 3:
+            lhs, obj, rhs = (make_op(operand(o)) for o in operands)
+            node = ChainCompareOp(lhs, obj, rhs, (_COMPARISONS[name], _COMPARISONS[name]))
+        elif (make := _BUILDERS.get((name, len(operands)))) is not None:
+            operands = [operand(o) for o in operands]
+            if name in _REFLECTED and not isinstance(operands[0], Op) and isinstance(operands[1], Op):
+                make, operands = _BUILDERS[_REFLECTED[name], 2], operands[::-1]
+            node = make(*operands)
+        else:
+            raise ValueError(f'unknown operation {name!r} of {len(operands)} operands in {x!r}')
+        built[id(x)] = node
+
+    return make_op(operand(spec))
+
+
+_AST_OPERATORS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.FloorDiv: '//', ast.Mod: '%', ast.Pow: '**',
+    ast.LShift: '<<', ast.RShift: '>>', ast.BitAnd: '&', ast.BitXor: '^', ast.BitOr: '|', ast.USub: '-',
+    ast.UAdd: '+', ast.Invert: '~', ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>',
+    ast.GtE: '>=',
+}
+_LITERAL_UNARY = {ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Invert: operator.invert}
+# the builtins made nodes by the special methods of Op rather than called
+_SPECIAL_CALLS = {('abs', 1): 'abs', ('round', 2): 'round', ('divmod', 2): 'divmod'}
+_INDEX_PARAMETER = re.compile(r'_(\d+)')
+
+
+# the child nodes each kind of ast node is built from, in order
+_AST_OPERANDS = {
+    ast.BinOp: lambda x: (x.left, x.right),
+    ast.UnaryOp: lambda x: (x.operand,),
+    ast.Attribute: lambda x: (x.value,),
+    ast.Compare: lambda x: (x.left, *x.comparators),
+    ast.Subscript: lambda x: (x.value, x.slice),
+    ast.Call: lambda x: (x.func, *x.args, *(k.value for k in x.keywords)),
+    ast.Tuple: lambda x: x.elts,
+    ast.List: lambda x: x.elts,
+    ast.Set: lambda x: x.elts,
+    ast.Dict: lambda x: (*x.keys, *x.values) if None not in x.keys else (),
+    ast.Slice: lambda x: tuple(y for y in (x.lower, x.upper, x.step) if y is not None),
+    ast.BoolOp: lambda x: x.values,
+    ast.IfExp: lambda x: (x.test, x.body, x.orelse),
+}
+
+
+def parse(source: str, names: Mapping = None):
+    """Builds the expression written in `source` with python syntax, as the operators would, without evaluating
+    it: `parse('_0.price * _1 + abs(_2)')` is `_0.price * _1 + abs(_2)`. Names `_0`, `_1`, ... are positional
+    parameters, names found in `names` are their values made lazy, e.g. functions to call, and other names are
+    keyword parameters. `and`, `or` and conditional expressions are made `and_`, `or_` and `if_`, evaluating only
+    the operands needed. Chained comparisons of two comparisons are supported, while `not`, `in` and `is`,
+    comprehensions, lambdas and special attributes such as `__class__` are not.
+    Literal numbers are not combined, `2 * 3` stays a node; `optimize` folds them.
+
+    Expressions are cached by source text and names, so parsing the same text again returns the same expression
+    without parsing it"""
+    try:
+        key = source if not names else (source, frozenset(names.items()))
+        hash(key)
+    except TypeError:
+        key = None
+    if key is not None and (r := _parse_cache.get(key)) is not None:
+        return r
 
-    f(op)
-    return tuple(parameters.keys())
+    names = names or {}
+    root = ast.parse(source.strip(), mode='eval').body
+    parameters, built = {}, {}
+
+    def unsupported(node):
+        return ValueError(f'unsupported syntax {ast.get_source_segment(source.strip(), node)!r} in {source!r}')
+
+    stack = [(root, None)]  # a node is pushed again with its operands once they are pushed
+    while stack:
+        node, operands = stack.pop()
+        if operands is None:
+            stack.append((node, operands := (f(node) if (f := _AST_OPERANDS.get(type(node))) else ())))
+            stack.extend((o, None) for o in reversed(operands))
+            continue
+
+        operands = [built[id(o)] for o in operands]
+        if isinstance(node, ast.Constant):
+            r = node.value
+        elif isinstance(node, ast.Name):
+            if node.id in names:
+                r = make_op(names[node.id])
+            elif (r := parameters.get(node.id)) is None:
+                m = _INDEX_PARAMETER.fullmatch(node.id)
+                r = parameters[node.id] = ParameterOp(_index=int(m[1])) if m else ParameterOp(_name=node.id)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _AST_OPERATORS:
+            r = _BUILDERS[_AST_OPERATORS[type(node.op)], 2](*operands)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _AST_OPERATORS:
+            obj, = operands
+            if isinstance(obj, (int, float, complex)):  # a negative literal
+                r = _LITERAL_UNARY[type(node.op)](obj)
+            else:
+                r = _BUILDERS[_AST_OPERATORS[type(node.op)], 1](obj)
+        elif isinstance(node, ast.Compare) and any(type(o) not in _AST_OPERATORS for o in node.ops):
+            raise unsupported(node)  # in, not in, is and is not
+        elif isinstance(node, ast.Compare) and len(node.ops) == 1:
+            name, (lhs, rhs) = _AST_OPERATORS[type(node.ops[0])], operands
+            if name in _REFLECTED and not isinstance(lhs, Op) and isinstance(rhs, Op):
+                name, lhs, rhs = _REFLECTED[name], rhs, lhs
+            r = _BUILDERS[name, 2](lhs, rhs)
+        elif isinstance(node, ast.Compare) and len(node.ops) == 2 \
+                and all(_AST_OPERATORS[type(o)] in _COMPARISONS for o in node.ops):
+            r = ChainCompareOp(*(make_op(o) for o in operands),
+                               tuple(_COMPARISONS[_AST_OPERATORS[type(o)]] for o in node.ops))
+        elif isinstance(node, ast.Attribute) and not (node.attr.startswith('__') and node.attr.endswith('__')):
+            r = GetattrOp(make_op(operands[0]), node.attr)
+        elif isinstance(node, ast.Subscript):
+            r = GetitemOp(make_op(operands[0]), operands[1])
+        elif isinstance(node, ast.Slice) and not any(isinstance(o, Op) for o in operands):
+            r = slice(*(built[id(x)] if x is not None else None for x in (node.lower, node.upper, node.step)))
+        elif isinstance(node, ast.Call) and not any(isinstance(a, ast.Starred) for a in node.args) \
+                and all(k.arg is not None for k in node.keywords):
+            fn, args = operands[0], operands[1:len(node.args) + 1]
+            kwargs = dict(zip((k.arg for k in node.keywords), operands[len(node.args) + 1:]))
+            special = isinstance(node.func, ast.Name) and node.func.id not in names and not kwargs \
+                and _SPECIAL_CALLS.get((node.func.id, len(args)))
+            r = _BUILDERS[special, len(args)](*args) if special else CallOp(fn, args, kwargs)
+        elif isinstance(node, ast.BoolOp):
+            r = ShortCircuitOp('and_' if isinstance(node.op, ast.And) else 'or_', operands)
+        elif isinstance(node, ast.IfExp):
+            r = IfOp(*(make_op(o) for o in operands))
+        elif isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+            r = {ast.Tuple: tuple, ast.List: list, ast.Set: set}[type(node)](operands)
+        elif isinstance(node, ast.Dict) and None not in node.keys:
+            r = dict(zip(operands[:len(node.keys)], operands[len(node.keys):]))
+        else:
+            raise unsupported(node)
+        built[id(node)] = r
+
+    r = make_op(built[id(root)])
+    if key is not None:
+        _parse_cache.put(key, r)
+    return r
 
 
 def replace(op, mapping):
+    if not isinstance(op, Op):
+        return op
+    replaced = {}
+
     def replacer(x):
-        return y if ((y := mapping.get(x, None) if isinstance(x, Op) else x) is not None
-                     ) else x.__transform__(replacer)
+        return replaced[id(x)] if isinstance(x, Op) else x
+
+    for x in _postorder(op, expand=lambda x: mapping.get(x) is None):
+        replaced[id(x)] = y if (y := mapping.get(x)) is not None else x.__transform__(replacer)
+
+    return replaced[id(op)]
+
+
+def _rebuild(op, fn):
+    # transforms the operands of op with fn, making a new node only if any of them changed
+    operands = {}
+
+    def f(x):
+        if isinstance(x, Op) and id(x) not in operands:
+            operands[id(x)] = (x, fn(x))
+        return None, True
+
+    op.__visit_operands__(f)
+    if any(x is not y for x, y in operands.values()):
+        return op.__transform__(lambda x: operands[id(x)][1] if isinstance(x, Op) else x)
+    return op
+
+
+def _is_int_const(op, value):
+    return isinstance(op, ConstOp) and type(op._value) is int and op._value == value
+
+
+def _fold(op):
+    # only immutable results are folded, so a constant is never shared between calls and mutated, nor an
+    # iterator consumed by the first one
+    try:
+        r = op.__invoke__()
+        hash(r)
+    except Exception:
+        return op
+    if isinstance(r, (Op, Item, FailedOp)) or not _is_cacheable(r):
+        return op
+    return ConstOp(r)
+
+
+def optimize(expr: Union[Op, Sequence[Op], Mapping]):
+    """Returns an equivalent, smaller expression: subtrees with constant operands only, including calls to
+    callables marked with `pure`, are evaluated once and replaced with their result, and the identities
+    `x * 1`, `x + 0`, `x - 0`, `--x` and `~~x` are removed (assuming numeric operands)."""
+    expr = make_op(expr)
+    optimized = {}
+    for x in _postorder(expr):  # operands first, so they are always found optimized
+        optimized[id(x)] = x.__optimize__(lambda y: optimized[id(y)])
+
+    return optimized[id(expr)]
+
+
+def specialize(expr: Union[Op, Sequence[Op], Mapping], *args, **known):
+    """Binds some of the parameters, like `functools.partial`: `args` are the leading positional arguments and
+    `known` the keyword ones. Every subtree that depends on bound parameters only is evaluated once and replaced
+    with its result, so the returned residual expression takes the remaining arguments, e.g.
+    `specialize(_0.rate * _1, product)` is evaluated as `calc(residual, market)`. As with `optimize`, only
+    immutable results are folded: subtrees that fail, or evaluate to mutable values, iterators or Ops, are kept
+    to be evaluated on every call."""
+    expr = make_op(expr)
+    specialized, free, depends = {}, {}, set()  # depends: the subtrees using bound parameters
+
+    def operand(x):
+        return specialized[id(x)] if isinstance(x, Op) else x
+
+    for x in _postorder(expr):
+        if isinstance(x, ParameterOp):
+            if x._name is not None and x._name in known or x._index is not None and x._index < len(args):
+                specialized[id(x)] = ConstOp(known[x._name] if x._name in known else args[x._index])
+                free[id(x)] = frozenset()
+                depends.add(id(x))
+            else:
+                index = x._index - len(args) if x._index is not None else None
+                specialized[id(x)] = ParameterOp(_index=index, _name=x._name, _type=x._type) if args else x
+                free[id(x)] = frozenset((id(x),))
+            continue
+
+        operands = _operands(x)
+        # the unbound parameters and the iterators of enclosing comprehensions the subtree depends on
+        f = frozenset().union(*(free[id(o)] for o in operands))
+        if isinstance(x, IterOp):
+            f |= {id(x)}
+        elif isinstance(x, ComprehensionOp):
+            f -= {id(i) for i in find_iterators(x._item, tp=IterOp)[1]}
+        free[id(x)] = f
+
+        y = _rebuild(x, operand)
+        if any(id(o) in depends for o in operands):
+            depends.add(id(x))
+        if not f and id(x) in depends:
+            y = _fold(y)
+        specialized[id(x)] = y
+
+    return specialized[id(expr)]
+
+
+def _value_key(value):
+    try:
+        hash(value)
+    except TypeError:
+        return type(value), id(value)
+    return type(value), value
+
+
+def structural_key(expr: Union[Op, Sequence[Op], Mapping]):
+    """Returns a hashable key that is equal for structurally identical expressions, e.g. `_1 + _2` built
+    twice. Constants that are not hashable are compared by identity."""
+    expr = make_op(expr)
+    keys = {}
+
+    def key(x):
+        if not isinstance(x, Op):
+            return _value_key(x)
+        if (k := keys.get(id(x))) is None:
+            k = keys[id(x)] = x.__key__(key)
+        return k
+
+    for x in _postorder(expr):
+        key(x)
+    return keys[id(expr)]
+
+
+class Interner:
+    """Hash-consing table: expressions interned through the same Interner share a single instance for every
+    structurally identical subtree. Subtrees that bind comprehension iterators are never shared."""
+
+    def __init__(self):
+        self._table = {}
+        self._interned = set()  # ids of the canonical nodes, kept alive by _table
+
+    def __len__(self):
+        return len(self._table)
+
+    def __call__(self, expr: Union[Op, Sequence[Op], Mapping]):
+        return self._intern(make_op(expr), {})
+
+    def _intern(self, op, memo):
+        def interned(x):
+            return x if id(x) in self._interned else memo[id(x)]
+
+        for x in _postorder(op, expand=lambda x: id(x) not in self._interned):
+            if id(x) in self._interned or id(x) in memo:
+                continue
+
+            canonical = _rebuild(x, interned)
+            key = canonical.__key__(lambda y: id(y) if isinstance(y, Op) else _value_key(y))
+            if (r := self._table.get(key)) is None:
+                r = self._table[key] = canonical
+                self._interned.add(id(r))
+            if isinstance(r, ConstOp) and isinstance(r._value, Item):
+                r._value.__expression__ = r
+            memo[id(x)] = r
+
+        return interned(op)
+
+
+@contextmanager
+def interning(interner: Interner = None):
+    """Within the block every Op constructed, including through operator overloads, is interned"""
+    global _interning_count
+
+    interner = interner or Interner()
+    token = _interner.set(interner)
+    with _interning_lock:
+        # the construction hook is only installed while needed, so it costs nothing otherwise
+        if _interning_count == 0:
+            _OpMeta.__call__ = _interning_call
+        _interning_count += 1
+    try:
+        yield interner
+    finally:
+        _interner.reset(token)
+        with _interning_lock:
+            _interning_count -= 1
+            if _interning_count == 0:
+                del _OpMeta.__call__
+
+
+def _shared_nodes(op):
+    # ids of the nodes referenced more than once in the tree, cached on its root. Comprehension items are
+    # evaluated with their own arguments, so nodes within them are not considered
+    if (shared := getattr(op, '__shared__', None)) is None:
+        seen, shared = set(), set()
+        stack = [op] if isinstance(op, Op) else []
+        while stack:
+            x = stack.pop()
+            if id(x) in seen:
+                if x.__stepwise__ or isinstance(x, ComprehensionOp):  # leaves are as cheap to evaluate again
+                    shared.add(id(x))
+            else:
+                seen.add(id(x))
+                if not isinstance(x, ComprehensionOp):
+                    stack.extend(_operands(x))
+        shared = frozenset(shared)
+        if isinstance(op, Op):
+            op.__shared__ = shared
+    return shared
+
+
+class _Frame:
+    # arguments of a single evaluation, and the values of the shared nodes evaluated so far
+    __slots__ = ('args', 'kwargs', 'shared', 'memo')
+
+    def __init__(self, args, kwargs, shared):
+        self.args = args
+        self.kwargs = kwargs
+        self.shared = shared
+        self.memo = {}
+
+    def eval(self, op):
+        # nodes with operands implement __eval__ as a generator yielding each operand and receiving its value.
+        # The generators are driven from an explicit stack, so the depth of a tree is only limited by memory
+        if self.shared:
+            return self._eval_shared(op)
+        if not op.__stepwise__:
+            return op.__eval__(self)
+
+        stack = []
+        step, value = op.__eval__(self), None
+        while True:
+            try:
+                op = step.send(value)
+            except StopIteration as e:
+                if not stack:
+                    return e.value
+                step, value = stack.pop(), e.value
+                continue
+
+            if op.__stepwise__:
+                stack.append(step)
+                step, value = op.__eval__(self), None
+            else:
+                value = op.__eval__(self)
+
+    def _eval_shared(self, op):
+        # as eval, but the values of shared nodes are kept in memo
+        shared, memo, stack = self.shared, self.memo, []
+        node = step = None
+        while True:
+            if id(op) in shared and (value := memo.get(id(op), _missing)) is not _missing:
+                pass
+            elif op.__stepwise__:
+                if step is not None:
+                    stack.append((node, step))
+                node, step, value = op, op.__eval__(self), None
+            else:
+                value = op.__eval__(self)
+                if id(op) in shared:
+                    memo[id(op)] = value
+
+            while step is not None:
+                try:
+                    op = step.send(value)
+                    break
+                except StopIteration as e:
+                    value = e.value
+                    if id(node) in shared:
+                        memo[id(node)] = value
+                    node, step = stack.pop() if stack else (None, None)
+            else:
+                return value
+
 
-    return replacer(op)
+_missing = object()
+
+# the most nodes evaluated one within another by compiled closures or __batch__, which recurse into the operands,
+# taller trees are split into parts so that their evaluation stays far from the recursion limit
+_MAX_NESTING = 100
+
+
+def _is_leaf(op):
+    return not op.__stepwise__ and not isinstance(op, ComprehensionOp)
+
+
+class _AsyncFrame(_Frame):
+    # arguments of an acalc evaluation and the tasks evaluating its shared nodes
+    __slots__ = ('tasks',)
+
+    def __init__(self, args, kwargs, shared):
+        super().__init__(args, kwargs, shared)
+        self.tasks = {}
+
+    async def aeval(self, op):
+        if _is_leaf(op):
+            return self.eval(op)
+        if id(op) in self.shared:
+            if (task := self.tasks.get(id(op))) is None:
+                task = self.tasks[id(op)] = asyncio.ensure_future(self._aeval(op))
+            return await task
+        return await self._aeval(op)
+
+    async def _aeval(self, op):
+        if isinstance(op, ComprehensionOp):
+            item, bindings = op._bindings(self.args, self.kwargs)
+            shared = _shared_nodes(item)
+            try:
+                frames = [_AsyncFrame(self.args, values, shared) for values in bindings]
+            except FailedOp as r:
+                return r
+            values = await asyncio.gather(*(f.aeval(item) for f in frames))
+            return iter(values) if op._tp is types.GeneratorType else op._tp(values)
+
+        # operands other than leaves run as tasks of their own, so they proceed concurrently, and deep trees do
+        # not nest coroutines
+        operands = [o for o in _operands(op) if not _is_leaf(o)] if op.__eager__ else []
+        values = dict(zip(map(id, operands), await asyncio.gather(*(self.aeval(o) for o in operands))))
+
+        step, value = op.__eval__(self), None
+        try:
+            while True:
+                o = step.send(value)
+                if id(o) in values:
+                    value = values[id(o)]
+                elif _is_leaf(o):
+                    value = self.eval(o)
+                else:
+                    value = await asyncio.ensure_future(self.aeval(o))
+        except StopIteration as e:
+            value = e.value
+
+        if inspect.isawaitable(value):
+            value = await value
+        return value
+
+
+class Profile:
+    """Evaluation statistics of every node evaluated within `profiling`: the number of evaluations, the
+    cumulative time including the operands, the self time excluding them, and the number of failures, which
+    are evaluations returning a FailedOp or raising. Nodes with the same repr are reported together."""
+
+    def __init__(self):
+        self._stats = {}  # id of node: [node, count, cumulative, self, failures]; the node keeps its id unique
+
+    def __len__(self):
+        return len(self._stats)
+
+    def _record(self, op, cumulative, self_time, failed):
+        if (s := self._stats.get(id(op))) is None:
+            s = self._stats[id(op)] = [op, 0, 0.0, 0.0, 0]
+        s[1] += 1
+        s[2] += cumulative
+        s[3] += self_time
+        s[4] += failed
+
+    def as_dict(self):
+        """The statistics keyed by the repr of the node, as dicts of count, cumulative, self and failures"""
+        stats = {}
+        for op, count, cumulative, self_time, failures in self._stats.values():
+            s = stats.setdefault(repr(op), {'count': 0, 'cumulative': 0.0, 'self': 0.0, 'failures': 0})
+            s['count'] += count
+            s['cumulative'] += cumulative
+            s['self'] += self_time
+            s['failures'] += failures
+        return stats
+
+    def table(self, sort: str = 'self', limit: int = None, width: int = 80):
+        """The statistics as a text table sorted by the `sort` column, largest first, with the reprs cut to
+        `width` characters"""
+        rows = sorted(self.as_dict().items(), key=lambda x: x[1][sort], reverse=True)[:limit]
+        lines = [f"{'count':>10} {'cumulative':>12} {'self':>12} {'failures':>8}  expression"]
+        for expr, s in rows:
+            expr = expr if len(expr) <= width else expr[:width - 3] + '...'
+            lines.append(f"{s['count']:>10} {s['cumulative']:>12.6f} {s['self']:>12.6f} {s['failures']:>8}  {expr}")
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.table()
+
+
+class _ProfilingFrame(_Frame):
+    # as _Frame, recording the time spent in every node
+    __slots__ = ('profile',)
+
+    def __init__(self, args, kwargs, shared, profile):
+        super().__init__(args, kwargs, shared)
+        self.profile = profile
+
+    def eval(self, op):
+        shared, memo, record, clock = self.shared, self.memo, self.profile._record, time.perf_counter
+        stack = []
+        node = step = None
+        start = children = 0.0  # of node: the time it started, and the time spent in its operands so far
+        while True:
+            if id(op) in shared and (value := memo.get(id(op), _missing)) is not _missing:
+                pass
+            elif op.__stepwise__:
+                if step is not None:
+                    stack.append((node, step, start, children))
+                node, start, children = op, clock(), 0.0
+                step, value = op.__eval__(self), None
+            else:
+                t = clock()
+                try:
+                    value = op.__eval__(self)
+                except Exception:
+                    record(op, clock() - t, clock() - t, True)
+                    raise
+                elapsed = clock() - t
+                record(op, elapsed, elapsed, isinstance(value, FailedOp))
+                children += elapsed
+                if id(op) in shared:
+                    memo[id(op)] = value
+
+            while step is not None:
+                try:
+                    op = step.send(value)
+                    break
+                except StopIteration as e:
+                    value = e.value
+                except Exception:
+                    elapsed = clock() - start
+                    record(node, elapsed, elapsed - children, True)
+                    raise
+                elapsed = clock() - start
+                record(node, elapsed, elapsed - children, isinstance(value, FailedOp))
+                if id(node) in shared:
+                    memo[id(node)] = value
+                if stack:
+                    node, step, start, children = stack.pop()
+                    children += elapsed
+                else:
+                    node, step = None, None
+            else:
+                return value
+
+
+def _profiled_invoke(self, *args, **kwargs):
+    if (profile := _profile.get()) is not None:
+        return _ProfilingFrame(args, kwargs, _shared_nodes(self), profile).eval(self)
+    return _invoke(self, *args, **kwargs)
+
+
+@contextmanager
+def profiling(profile: Profile = None):
+    """Within the block every evaluation by `calc`, and by `Expression` and comprehensions through it, records
+    the time spent in each node into the yielded `Profile`. Compiled expressions are not profiled:
+
+        with profiling() as profile:
+            calc(expr, *args)
+        print(profile.table(limit=10))
+    """
+    global _profiling_count
+
+    profile = profile if profile is not None else Profile()
+    token = _profile.set(profile)
+    with _profiling_lock:
+        # the evaluation hook is only installed while needed, so it costs nothing otherwise
+        if _profiling_count == 0:
+            Op.__invoke__ = _profiled_invoke
+        _profiling_count += 1
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+        with _profiling_lock:
+            _profiling_count -= 1
+            if _profiling_count == 0:
+                Op.__invoke__ = _invoke
 
 
 def calc(expr: Union[Op, Sequence[Op], Mapping], *args, raise_=True, **kwargs):
@@ -775,15 +2291,573 @@ def calc(expr: Union[Op, Sequence[Op], Mapping], *args, raise_=True, **kwargs):
     return r
 
 
+async def acalc(expr: Union[Op, Sequence[Op], Mapping], *args, raise_=True, **kwargs):
+    """Like `calc`, but awaits the awaitable results of calls, attribute lookups and other operations, such as
+    the coroutines returned by async functions made lazy. The operands of a node are evaluated concurrently,
+    e.g. both sides of `lazy(fetch)(_0) + lazy(fetch)(_1)` are awaited together, as are the items of a
+    comprehension. The sources of comprehension iterators are evaluated synchronously."""
+    expr = make_op(expr)
+    r = await _AsyncFrame(args, kwargs, _shared_nodes(expr)).aeval(expr)
+    if isinstance(r, FailedOp) and raise_:
+        raise r
+
+    return r
+
+
+def _to_column(values):
+    values = list(values)
+    if all(isinstance(v, (bool, int, float, complex, np.generic)) for v in values):
+        return np.asarray(values)
+
+    column = np.empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        column[i] = v
+    return column
+
+
+class _Batch:
+    def __init__(self, columns, shared):
+        if isinstance(columns, Mapping):
+            indexed = {k: v for k, v in columns.items() if isinstance(k, int)}
+            if sorted(indexed) != list(range(len(indexed))):
+                raise ValueError(f'positional columns must be numbered from 0, got {sorted(indexed)}')
+            args = [indexed[i] for i in range(len(indexed))]
+            kwargs = {k: v for k, v in columns.items() if not isinstance(k, int)}
+        else:
+            args, kwargs = list(columns), {}
+
+        self.args = tuple(c if isinstance(c, np.ndarray) else _to_column(c) for c in args)
+        self.kwargs = {k: c if isinstance(c, np.ndarray) else _to_column(c) for k, c in kwargs.items()}
+
+        lengths = {len(c) for c in itertools.chain(self.args, self.kwargs.values())}
+        if len(lengths) > 1:
+            raise ValueError(f'columns must be of equal length, got lengths {sorted(lengths)}')
+        self.n = lengths.pop() if lengths else 0
+        self.shared = shared
+        self.memo = {}
+
+    def eval(self, op):
+        if (r := self.memo.get(id(op), _missing)) is not _missing:
+            return r
+        if id(op) in self.shared:
+            r = self.memo[id(op)] = op.__batch__(self)
+            return r
+        return op.__batch__(self)
+
+    def eval_cut(self, op):
+        # as eval, but a tall tree is evaluated bottom up, a part at most _MAX_NESTING nodes high at a time. The
+        # nodes with their own __batch__ evaluate all of their operands, so the columns evaluated ahead are the
+        # ones they would evaluate
+        levels = {}
+        for x in _postorder(op, expand=lambda x: type(x).__batch__ is not Op.__batch__):
+            levels[id(x)] = level = 1 + max((levels.get(id(o), 0) for o in _operands(x)), default=0)
+            if level >= _MAX_NESTING and x is not op:
+                self.memo[id(x)] = x.__batch__(self)
+                levels[id(x)] = 0
+        return self.eval(op)
+
+    def rowwise(self, op):
+        names = tuple(self.kwargs.keys())
+        values = []
+        for i in range(self.n):
+            r = op.__invoke__(*(c[i] for c in self.args), **{k: self.kwargs[k][i] for k in names})
+            if isinstance(r, FailedOp):
+                return r
+            values.append(r)
+
+        return _to_column(values)
+
+
+def calc_batch(expr: Union[Op, Sequence[Op], Mapping], columns: Union[Sequence, Mapping], raise_=True):
+    """Evaluates the expression over whole columns at once. `columns` is either a sequence of positional
+    columns or a mapping of parameter names (or positional indices) to columns, each a NumPy array or a
+    list of the same length. Arithmetic and comparisons run as array operations (with NumPy's numeric
+    semantics); other nodes are evaluated row by row. Returns an array with one result per row."""
+    if np is None:
+        raise ImportError('calc_batch requires numpy')
+
+    expr = make_op(expr)
+    batch = _Batch(columns, _shared_nodes(expr))
+    r = batch.eval_cut(expr)
+    if isinstance(r, FailedOp):
+        if raise_:
+            raise r
+        return r
+
+    if not isinstance(r, np.ndarray) or r.shape[:1] != (batch.n,):
+        r = _to_column([r] * batch.n)
+    return r
+
+
+def _memoized(fn):
+    # a shared node's closure, evaluated at most once per call of the compiled expression
+    def f(args, kwargs, memo):
+        if (r := memo.get(f, _missing)) is _missing:
+            r = memo[f] = fn(args, kwargs, memo)
+        return r
+
+    return f
+
+
+class _CompiledOp(Op):
+    # a subtree lowered into a closure, within the part of a tall tree evaluated by _Frame
+    def __init__(self, _op, _fn):
+        super().__init__(_priority=_op.__priority__())
+        self._op = _op
+        self._fn = _fn
+
+    def __repr_node__(self, r):
+        return repr(self._op)
+
+    def __eval__(self, frame):
+        try:
+            return self._fn(frame.args, frame.kwargs, frame.memo)
+        except FailedOp as r:
+            return r
+
+    def __visit_operands__(self, fn):
+        return None
+
+
+def _interpreted_above(expr, heights, c):
+    # the part of the tree higher than _MAX_NESTING is evaluated by _Frame, with the subtrees below it lowered into
+    # closures by c. The values of the shared nodes of both are kept in the same memo, keyed by node and closure
+    parts = {}
+    for x in _postorder(expr, expand=lambda x: heights[id(x)] > _MAX_NESTING):
+        if heights[id(x)] > _MAX_NESTING:
+            parts[id(x)] = _rebuild(x, lambda o: parts[id(o)])
+        else:
+            parts[id(x)] = _CompiledOp(x, c(x))
+    root = parts[id(expr)]
+    shared = _shared_nodes(root)
+
+    def f(args, kwargs, memo):
+        frame = _Frame(args, kwargs, shared)
+        if memo is not None:
+            frame.memo = memo
+        r = frame.eval(root)
+        if isinstance(r, FailedOp):
+            raise r
+        return r
+
+    return f
+
+
+def compile(expr: Union[Op, Sequence[Op], Mapping]):
+    """Lowers the expression into a chain of closures once, so it can be evaluated repeatedly without walking
+    the Op tree. The returned function takes the same arguments as `calc` and returns identical results."""
+    expr = make_op(expr)
+    shared = _shared_nodes(expr)
+    compiled_nodes, heights = {}, {}
+
+    def c(op):
+        if (f := compiled_nodes.get(id(op))) is None:
+            f = compiled_nodes[id(op)] = op.__compile__(c) if id(op) not in shared else _memoized(op.__compile__(c))
+        return f
+
+    # operands are lowered first, so c finds them lowered instead of recursing into them. A closure calls the
+    # closures of its operands, so only subtrees at most _MAX_NESTING nodes high are lowered
+    for x in _postorder(expr, expand=lambda x: not isinstance(x, ComprehensionOp)):
+        operands = _operands(x) if not isinstance(x, ComprehensionOp) else ()
+        heights[id(x)] = height = 1 + max((heights[id(o)] for o in operands), default=-1)
+        if height <= _MAX_NESTING:
+            c(x)
+
+    fn = c(expr) if heights[id(expr)] <= _MAX_NESTING else _interpreted_above(expr, heights, c)
+
+    def compiled(*args, raise_=True, **kwargs):
+        try:
+            return fn(args, kwargs, {} if shared else None)
+        except FailedOp as r:
+            if raise_:
+                raise
+            return r
+
+    return compiled
+
+
+_FORMAT = b'dexpr'
+_FORMAT_VERSION = 1
+_OP, _TUPLE, _LIST, _DICT, _REF, _PICKLED = range(6)
+
+
+def _node_state(op):
+    # the fields of a node, without the values cached on it, such as __shared__
+    return {k: v for k, v in op.__dict__.items() if not k.startswith('__')}
+
+
+def _map_value(value, op_fn, other_fn):
+    # applies op_fn to the Ops within a field value, and other_fn to any other object that is not a container
+    if isinstance(value, Op):
+        return op_fn(value)
+    if type(value) in (tuple, list):
+        return type(value)(_map_value(v, op_fn, other_fn) for v in value)
+    if type(value) is dict:
+        return {_map_value(k, op_fn, other_fn): _map_value(v, op_fn, other_fn) for k, v in value.items()}
+    return other_fn(value)
+
+
+def _import_path(obj):
+    # 'module:qualname' of a function or class that can be imported back, otherwise None
+    if not isinstance(obj, (type, types.FunctionType, types.BuiltinFunctionType)):
+        return None
+    if obj is types.GeneratorType:  # the output type of generator comprehensions, not found as builtins.generator
+        return 'types:GeneratorType'
+    module, qualname = getattr(obj, '__module__', None), getattr(obj, '__qualname__', None)
+    if module is None or qualname is None or '<' in qualname:
+        return None
+    try:
+        if _import(f'{module}:{qualname}') is obj:
+            return f'{module}:{qualname}'
+    except (ImportError, AttributeError):
+        pass
+    return None
+
+
+def _import(path):
+    module, qualname = path.split(':')
+    r = importlib.import_module(module)
+    for name in qualname.split('.'):
+        r = getattr(r, name)
+    return r
+
+
+def dumps(expr: Union[Op, Sequence[Op], Mapping]) -> bytes:
+    """Serializes the expression into a compact, versioned binary format, loaded back with `loads`.
+    Functions and classes are stored by import path, other constants are pickled."""
+    expr = make_op(expr)
+    index, paths, layouts = {}, {}, {}
+    nodes = []
+
+    def encode(value):
+        if value is None or type(value) in (bool, int, float, complex, str, bytes):
+            return value
+        if isinstance(value, Op):
+            return _OP, index[id(value)]
+        if type(value) is tuple:
+            return _TUPLE, [encode(v) for v in value]
+        if type(value) is list:
+            return _LIST, [encode(v) for v in value]
+        if type(value) is dict:
+            return _DICT, [(encode(k), encode(v)) for k, v in value.items()]
+        if (path := paths.get(id(value))) is None and (path := _import_path(value)) is not None:
+            paths[id(value)] = path  # the same string object, so it is written once
+        if path is not None:
+            return _REF, path
+        try:
+            return _PICKLED, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise pickle.PicklingError(f'{value!r} is neither importable nor picklable') from e
+
+    for x in _postorder(expr):  # operands are stored before the nodes referring to them
+        state = _node_state(x)
+        # the class and field names of each node layout are written once, nodes only refer to them
+        layout = layouts.setdefault((type(x), tuple(state)), len(layouts))
+        index[id(x)] = len(nodes)
+        nodes.append((layout, *(encode(v) for v in state.values())))
+
+    layouts = [(encode(tp), fields) for tp, fields in layouts]
+    return _FORMAT + bytes((_FORMAT_VERSION,)) + marshal.dumps((layouts, nodes))
+
+
+def loads(data: bytes) -> Op:
+    """Loads an expression serialized with `dumps`"""
+    if data[:len(_FORMAT)] != _FORMAT:
+        raise ValueError('not a serialized expression')
+    if (version := data[len(_FORMAT)]) != _FORMAT_VERSION:
+        raise ValueError(f'unsupported serialized expression version {version}')
+
+    nodes = []
+
+    def decode(value):
+        if type(value) is not tuple:
+            return value
+        tag, v = value
+        if tag == _OP:
+            return nodes[v]
+        if tag == _TUPLE:
+            return tuple(decode(i) for i in v)
+        if tag == _LIST:
+            return [decode(i) for i in v]
+        if tag == _DICT:
+            return {decode(k): decode(i) for k, i in v}
+        if tag == _REF:
+            return _import(v)
+        return pickle.loads(v)
+
+    layouts, encoded = marshal.loads(data[len(_FORMAT) + 1:])
+    layouts = [(decode(tp), fields) for tp, fields in layouts]
+    for layout, *values in encoded:
+        tp, fields = layouts[layout]
+        op = object.__new__(tp)
+        op.__setstate__({k: decode(v) for k, v in zip(fields, values)})
+        nodes.append(op)
+
+    return nodes[-1]
+
+
+_worker_fn = None  # the compiled expression of a calc_parallel worker process
+
+
+def _init_worker(data):
+    global _worker_fn
+    _worker_fn = compile(loads(data))
+
+
+def _calc_item(fn, args, unpack=True):
+    # the result of the compiled expression for an item of calc_parallel or calc_stream, exceptions as FailedOp
+    try:
+        if not unpack:
+            return fn(args, raise_=False)
+        if isinstance(args, Mapping):
+            return fn(raise_=False, **args)
+        return fn(*args, raise_=False) if isinstance(args, tuple) else fn(args, raise_=False)
+    except Exception as e:
+        return FailedOp(f'evaluation raised {type(e).__name__}', e)
+
+
+def _calc_chunk(chunk, fn=None, unpack=True):
+    fn = fn or _worker_fn
+    return [_calc_item(fn, args, unpack) for args in chunk]
+
+
+def _sendable(result):
+    try:
+        pickle.dumps(result)
+    except Exception as e:
+        return FailedOp(f'result cannot be sent from the worker process, pickling raised {type(e).__name__}', e)
+    return result
+
+
+def _calc_worker_chunk(chunk, unpack):
+    # the results of a chunk pickled in the worker process, so that a result that cannot be pickled fails alone
+    results = _calc_chunk(chunk, unpack=unpack)
+    try:
+        return pickle.dumps(results)
+    except Exception:
+        return pickle.dumps([_sendable(r) for r in results])
+
+
+def calc_parallel(expr: Union[Op, Sequence[Op], Mapping], iterable_of_args, workers: int = None,
+                  chunksize: int = 256, ordered: bool = True, unpack: bool = True):
+    """Evaluates the expression for every item of `iterable_of_args` in a pool of `workers` processes (by
+    default one per CPU). An item is a tuple of positional arguments, a mapping of keyword arguments, or any
+    other value as the single positional argument. With `unpack=False` every item is the single positional
+    argument, tuples and mappings included, e.g. `calc_parallel(_0['k'], [{'k': 1}], unpack=False)`. The
+    expression is sent to each worker once and items are sent in chunks of `chunksize`, reading ahead of the
+    results by a few chunks per worker only.
+
+    Returns an iterator of the results in the order of the items, or if `ordered` is False, of `(index,
+    result)` pairs as soon as their chunk completes. An item that fails results in a FailedOp, exceptions
+    included, and does not stop the others, nor does a result that cannot be pickled back from its worker.
+    The expression is serialized and the pool created when called, before the first item is read; closing the
+    iterator early cancels the chunks not started."""
+    if chunksize < 1:
+        raise ValueError(f'chunksize must be positive, got {chunksize}')
+    data = dumps(expr)
+    workers = workers or os.cpu_count() or 1
+    items = iter(iterable_of_args)
+    pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data,))
+    return _parallel(pool, items, workers, chunksize, ordered, unpack)
+
+
+def _parallel(pool, items, workers, chunksize, ordered, unpack):
+    # the results of calc_parallel, the pool is shut down once they are exhausted or the iterator is closed
+    chunks = iter(lambda: list(itertools.islice(items, chunksize)), [])
+    try:
+        pending, start = deque(), 0
+        for chunk in itertools.islice(chunks, 2 * workers):
+            pending.append((start, pool.submit(_calc_worker_chunk, chunk, unpack)))
+            start += len(chunk)
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                completed, _ = concurrent.futures.wait([f for _, f in pending],
+                                                       return_when=concurrent.futures.FIRST_COMPLETED)
+                done = [p for p in pending if p[1] in completed]
+                pending = deque(p for p in pending if p[1] not in completed)
+
+            for first, future in done:
+                if (chunk := next(chunks, None)) is not None:
+                    pending.append((start, pool.submit(_calc_worker_chunk, chunk, unpack)))
+                    start += len(chunk)
+                results = pickle.loads(future.result())
+                if ordered:
+                    yield from results
+                else:
+                    yield from enumerate(results, first)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def calc_stream(expr: Union[Op, Sequence[Op], Mapping], rows, chunk: int = 1024, workers: int = None,
+                failed: str = 'yield', unpack: bool = True):
+    """Evaluates the expression for every row of the iterable `rows`, which may be unbounded, yielding the results
+    in the order of the rows as they are read. A row is a tuple of positional arguments, a mapping of keyword
+    arguments (e.g. from `csv.DictReader`), or any other value as the single positional argument (e.g. a list
+    from `csv.reader`). With `unpack=False` every row is the single positional argument.
+
+    Rows are evaluated one at a time, or with `workers` in a pool of threads, for expressions whose calls do
+    I/O or release the GIL, in chunks of `chunk` rows; `chunk` only applies with `workers`. The pool reads ahead
+    by two chunks per worker, so at most that many rows are held in memory. A row that fails results in a
+    FailedOp, exceptions included, which is yielded, dropped, or raised ending the stream, as `failed` is
+    'yield', 'skip' or 'raise'. The arguments are checked and the expression compiled when called, before the
+    first row is read."""
+    if failed not in ('yield', 'skip', 'raise'):
+        raise ValueError(f"failed must be 'yield', 'skip' or 'raise', got {failed!r}")
+    return _stream(compile(expr), rows, chunk, workers, failed, unpack)
+
+
+def _stream(fn, rows, chunk, workers, failed, unpack):
+    if not workers:
+        results = (_calc_item(fn, args, unpack) for args in rows)
+    else:
+        results = itertools.chain.from_iterable(_calc_chunks(fn, rows, chunk, workers, unpack))
+
+    for r in results:
+        if isinstance(r, FailedOp):
+            if failed == 'raise':
+                raise r
+            if failed == 'skip':
+                continue
+        yield r
+
+
+def _calc_chunks(fn, rows, chunk, workers, unpack):
+    # the results of the chunks of rows evaluated in a thread pool, in order, a bounded number of chunks ahead
+    rows = iter(rows)
+    chunks = iter(lambda: list(itertools.islice(rows, chunk)), [])
+    pool = concurrent.futures.ThreadPoolExecutor(workers)
+    try:
+        pending = deque(pool.submit(_calc_chunk, c, fn, unpack) for c in itertools.islice(chunks, 2 * workers))
+        while pending:
+            future = pending.popleft()
+            if (c := next(chunks, None)) is not None:
+                pending.append(pool.submit(_calc_chunk, c, fn, unpack))
+            yield future.result()
+    finally:
+        # when the stream is closed early the chunks not started are dropped
+        pool.shutdown(cancel_futures=True)
+
+
+def _call_key(args, kwargs):
+    # the cache key of a call, None when an argument is unhashable
+    key = (tuple(args), frozenset(kwargs.items())) if kwargs else tuple(args)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _is_cacheable(value):
+    # iterators and awaitables can be consumed only once
+    return not isinstance(value, collections.abc.Iterator) and not inspect.isawaitable(value)
+
+
+class LRU:
+    """A cache of at most `maxsize` results (unbounded if None), evicting the least recently used. Used by
+    `Expression(op, cache=LRU(...))` for the results of whole expressions and by `pure(fn, cache=LRU(...))` for
+    the results of calls. `hits`, `misses` and `evictions` count lookups and evicted results; lookups with
+    unhashable arguments bypass the cache and are not counted."""
+
+    def __init__(self, maxsize: int = 128):
+        if maxsize is not None and maxsize < 0:
+            raise ValueError(f'maxsize must be non-negative, got {maxsize}')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __repr__(self):
+        return f'LRU(maxsize={self.maxsize}, size={len(self)}, hits={self.hits}, misses={self.misses}, ' \
+               f'evictions={self.evictions})'
+
+    def __reduce__(self):
+        # the cached results stay in this process
+        return LRU, (self.maxsize,)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self.maxsize == 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def call(self, fn, args, kwargs):
+        # calls fn once per distinct key; fn runs outside the lock, so concurrent misses may both call it
+        if (key := _call_key((fn, *args), kwargs)) is None:
+            return fn(*args, **kwargs)
+        if (r := self.get(key, _missing)) is _missing:
+            r = fn(*args, **kwargs)
+            if _is_cacheable(r):
+                self.put(key, r)
+        return r
+
+
+_parse_cache = LRU(maxsize=4096)  # the expressions built by parse
+
+
 class Expression:
-    def __init__(self, op: Op):
+    def __init__(self, op: Op, compiled: bool = False, optimized: bool = False, cache: LRU = None):
+        op = optimize(op) if optimized else op
         self._op = op
+        self._fn = compile(op) if compiled else None
+        self.cache = cache
+        self._key = structural_key(op) if cache is not None else None  # expressions sharing a cache keep apart
 
-    def __call__(self, *args, **kwargs):
+    def _eval(self, *args, **kwargs):
+        if self._fn is not None:
+            return self._fn(*args, **kwargs)
         return calc(self._op, *args, **kwargs)
 
+    def __call__(self, *args, **kwargs):
+        if self.cache is None:
+            return self._eval(*args, **kwargs)
+
+        raise_ = kwargs.pop('raise_', True)
+        if (key := _call_key(args, kwargs)) is None:
+            return self._eval(*args, raise_=raise_, **kwargs)
+        key = (self._key, key)
+        if (r := self.cache.get(key, _missing)) is _missing:
+            r = self._eval(*args, raise_=False, **kwargs)
+            if _is_cacheable(r):
+                self.cache.put(key, r)
+        if isinstance(r, FailedOp) and raise_:
+            raise r
+        return r
+
     def __repr__(self):
-        return repr(self.op)
+        return repr(self._op)
 
     @property
     def __signature__(self):
@@ -806,4 +2880,98 @@ class Expression:
                 parametes.append(inspect.Parameter(f'i{i}', inspect.Parameter.POSITIONAL_OR_KEYWORD))
 
         parametes.extend(kw_parameters)
-        return inspect.Signature(parametes)
\ No newline at end of file
+        return inspect.Signature(parametes)
+
+
+class ReactiveExpression:
+    """Keeps the value of every node of an expression between evaluations, so that when some arguments change
+    only the nodes depending on them are evaluated again:
+
+        risk = ReactiveExpression(expr, book, spot=1.1, vol=0.2)
+        risk.update(spot=1.2)  # the branches not using spot keep their values
+
+    Nodes evaluating to iterators are evaluated again every time, as their values can be consumed only once.
+    Calls are assumed to depend only on their arguments."""
+
+    def __init__(self, expr: Union[Op, Sequence[Op], Mapping], *args, **kwargs):
+        self._op = make_op(expr)
+        self._args = list(args)
+        self._kwargs = dict(kwargs)
+        self._memo = {}
+
+        # every node is memoized, except within comprehensions, which are evaluated as a whole. A comprehension
+        # depends on the parameters used within it. Parameters are found by their index and by their name
+        self._parents, self._parameters = defaultdict(list), defaultdict(list)
+        seen, stack = {id(self._op)}, [self._op]
+        while stack:
+            x = stack.pop()
+            if isinstance(x, ParameterOp):
+                for key in (x._index, x._name):
+                    if key is not None:
+                        self._parameters[key].append(x)
+            if isinstance(x, ComprehensionOp):
+                for p in find_parameters(x._item):
+                    self._parents[id(p)].append(x)
+                    if id(p) not in seen:
+                        seen.add(id(p))
+                        stack.append(p)
+                continue
+            for o in _operands(x):
+                self._parents[id(o)].append(x)
+                if id(o) not in seen:
+                    seen.add(id(o))
+                    stack.append(o)
+        self._nodes = frozenset(seen)
+        self._stale = set(seen)  # evaluated since the values were last checked for iterators
+        self._volatile = set()
+
+    def __repr__(self):
+        return f'ReactiveExpression({repr(self._op)})'
+
+    def set(self, key: Union[int, str], value):
+        """Sets the positional argument with index `key`, or the keyword argument named `key`, without evaluating
+        the expression"""
+        if isinstance(key, int):
+            if key > len(self._args):
+                raise IndexError(f'positional argument {key} set before argument {len(self._args)}')
+            if key == len(self._args):
+                self._args.append(value)
+            else:
+                self._args[key] = value
+        else:
+            self._kwargs[key] = value
+
+        # the nodes that were not evaluated did not contribute to the value, nor did their parents through them
+        stack = list(self._parameters.get(key, ()))
+        while stack:
+            x = stack.pop()
+            if self._memo.pop(id(x), _missing) is not _missing or id(x) in self._volatile \
+                    or isinstance(x, ParameterOp):
+                self._stale.add(id(x))
+                stack.extend(self._parents[id(x)])
+
+    def update(self, *args, raise_=True, **kwargs):
+        """Replaces the leading positional arguments and the given keyword ones, and returns the new value. Only
+        the arguments that are not the same objects as before count as changed"""
+        for key, value in itertools.chain(enumerate(args), kwargs.items()):
+            current = self._args[key] if isinstance(key, int) and key < len(self._args) \
+                else self._kwargs.get(key, _missing) if isinstance(key, str) else _missing
+            if value is not current:
+                self.set(key, value)
+        return self.value(raise_=raise_)
+
+    def value(self, raise_=True):
+        """The value of the expression for the current arguments, evaluating only the nodes that changed"""
+        frame = _Frame(tuple(self._args), self._kwargs, self._nodes)
+        frame.memo = self._memo
+        r = frame._eval_shared(self._op)
+
+        for i in self._stale:
+            if (v := self._memo.get(i, _missing)) is not _missing and not _is_cacheable(v):
+                del self._memo[i]
+                self._volatile.add(i)
+        self._stale = set(self._volatile)
+
+        if isinstance(r, FailedOp) and raise_:
+            raise r
+        return r
@@ -2,7 +2,7 @@ from calendar import monthrange
 from dataclasses import dataclass
 from datetime import date, timedelta
 
-from dexpr import Tenor, days
+from dexpr import Tenor, days, months, years, as_of
 from dexpr.exprclass import ExprClass, dataclassex, CallableDescriptor, exprclass
 from dexpr.magic import ParameterOp, lazy
 
@@ -77,3 +77,16 @@ def test_exprclass_dates():
     e = date_expr_2()
     assert e.number_of_days == monthrange(e.today.year, e.today.month)[1]
 
+
+def test_dataclassex_date_as_of():
+    @dataclassex
+    class date_expr_3:
+        Self: 'date_expr_3'
+
+        last_monday_in_march: date = lambda x: years.mar.weeks[-1]
+        month_end: date = lambda x: months.end
+
+    with as_of('2024-05-17'):
+        e = date_expr_3()
+        assert e.last_monday_in_march == date(2025, 3, 31)
+        assert e.month_end == date(2024, 5, 31)
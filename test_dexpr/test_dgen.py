@@ -1,11 +1,12 @@
 from datetime import date, timedelta
+from itertools import islice
 
 import holidays
 import pytest
 
 from dexpr.calendar import WeekendCalendar, HolidayCalendar
 from dexpr.dgen import make_date, make_dgen, days, weeks, weekdays, weekends, months, years, business_days, roll_fwd, \
-    roll_bwd
+    roll_bwd, as_of, EveryDayDGen, WeekendsDGen, SubSequenceDGen
 from dexpr.magic import Expression
 from dexpr.tenor import Tenor
 
@@ -210,3 +211,179 @@ def test_date_expressions():
 
     c = months.fri[_0]
     assert list(Expression(c)(1)(after='2020-01-01', before='2020-02-01')) == [date(2020, 1, 10)]
+
+
+def test_concurrent_chained_comparisons():
+    from concurrent.futures import ThreadPoolExecutor
+
+    def check(n):
+        start = date(2024, 1, 1) + timedelta(days=n % 20)
+        c = start < days <= start + timedelta(days=3)
+        assert tuple(c()) == tuple(start + timedelta(days=i) for i in range(1, 4))
+        # a comparison that is not chained is not bounded by the chains of other threads
+        assert next((days <= '2024-12-31')(after=date(2024, 1, 1))) == date(2024, 1, 1)
+        return True
+
+    with ThreadPoolExecutor(8) as pool:
+        assert all(pool.map(check, range(2000)))
+
+
+@pytest.mark.parametrize('gen', [
+        days, weeks, months, years, weeks.fri, months.end, months.weeks[-2], months.fri, months.fri[4],
+        years.apr.fri[2], years.months[0:3], years.months.weeks.fri, months.days[14] + '1w', weeks[2:10:2],
+        months.weekdays, '2021-03-04' < months.fri <= '2023-07-07', weekdays,
+])
+def test_view(gen):
+    for after, before in (('2020-01-01', '2020-01-01'), ('2020-01-03', '2020-02-11'), ('2020-02-29', '2023-09-17')):
+        expected = list(gen(after=after, before=before))
+        view = gen.view(after, before)
+        assert list(view) == expected
+        assert len(view) == len(expected)
+        assert [view[i] for i in range(len(expected))] == expected
+        assert [view[i] for i in range(-len(expected), 0)] == expected
+        assert list(view[1:-1:2]) == expected[1:-1:2]
+        assert list(view[::-1]) == expected[::-1]
+        for d in expected:
+            assert view.count(d) == 1
+            assert view.index(d) == expected.index(d)
+        assert view.count(date(2019, 1, 1)) == 0
+        assert date(2019, 1, 1) not in view
+
+
+def test_view_closed_form():
+    view = years.apr.fri[2].view('0100-01-01', '9999-01-01')
+    assert len(view) == 9899
+    assert view[-1] == date(9998, 4, 17)
+    assert view.index(date(2023, 4, 21)) == 1923
+
+    view = days.view(before='9999-12-31')
+    assert len(view) == 3652059
+    assert view[-1] == date(9999, 12, 31)
+    assert view.count('2020-02-29') == 1
+
+    with pytest.raises(IndexError):
+        months.view('2020-01-01', '2020-12-31')[12]
+
+
+def test_view_open_ended():
+    # the periods of an open-ended sub sequence are only produced as far as an index reaches
+    for gen in (months.mon, months.weekdays, months.days[-1], years.months):
+        view = gen.view(date(2024, 5, 17))
+        assert view[37] == list(islice(gen(after=date(2024, 5, 17)), 38))[-1]
+    with pytest.raises(IndexError):
+        months.mon.view(date(9999, 11, 17))[9]
+
+    view = years.months.view()
+    assert len(view) == 119988
+    assert view[-1] == date(9999, 12, 1)
+    assert months.mon.view(date(9999, 11, 17))[-1] == date(9999, 12, 27)
+    assert list(years.days.view(date(9999, 12, 29))[-2:]) == [date(9999, 12, 29), date(9999, 12, 30)]
+
+
+@pytest.mark.parametrize('gen', [
+        days, weeks.fri, months.end, months.fri[-1], months.weeks[2], years.apr.fri[2], days[::3], months + '1m',
+        weekdays, business_days, months - '1b', weeks.fri | months.end, weekdays & months.end,
+        weekdays - months.fri[2], roll_fwd(months.days[14]), '2020-03-04' < months.fri <= '2020-07-07',
+])
+def test_point_queries(gen):
+    calendar = WeekendCalendar()
+    after, before = date(2020, 1, 3), date(2020, 11, 17)
+    expected = list(gen(after=after, before=before, calendar=calendar))
+    for d in (date(2019, 12, 1) + timedelta(days=i) for i in range(0, 400, 3)):
+        assert gen.contains(d, after, before, calendar) == (d in expected)
+        assert gen.next_after(d, after, before, calendar) == min((x for x in expected if x > d), default=None)
+        assert gen.prev_before(d, after, before, calendar) == max((x for x in expected if x < d), default=None)
+        assert gen.prev_before(d, after, before, calendar, inclusive=True) == \
+               max((x for x in expected if x <= d), default=None)
+
+
+def test_point_queries_unbounded():
+    assert months.end.contains('2024-02-29')
+    assert not months.end.contains('2024-02-28')
+    assert months.end.next_after('2024-02-29') == date(2024, 3, 31)
+    assert months.fri[-1].next_after('2024-05-17') == date(2024, 5, 31)
+    assert months.fri[-1].prev_before('2024-05-17') == date(2024, 4, 26)
+    assert (weeks.fri - '2024-05-24').next_after('2024-05-17') == date(2024, 5, 31)
+    assert months.fri[5].next_after('2024-05-17') is None
+    assert days.next_after(date.max) is None
+
+
+@pytest.mark.parametrize('gen', [
+        days, weeks.fri, months.end, months.weeks[-1], years.apr.fri[2], days[3:9], weekdays[2::5], months + '1m',
+        business_days, months - '1b', weeks.fri | months.end, weekdays & months.end, weekdays - months.fri[2],
+        roll_bwd(months.days[14]), months.weekdays[-3:], '2020-03-04' < months.fri <= '2020-07-07',
+])
+def test_descending(gen):
+    calendar = WeekendCalendar()
+    for after, before in (('2020-01-03', '2020-02-11'), ('2020-02-29', '2023-09-17')):
+        expected = list(gen(after=after, before=before, calendar=calendar))
+        assert list(gen(after=after, before=before, calendar=calendar, descending=True)) == expected[::-1]
+
+
+def test_descending_unbounded():
+    assert list(islice(months.end(before='2024-05-17', descending=True), 3)) == [
+            date(2024, 4, 30), date(2024, 3, 31), date(2024, 2, 29)]
+    assert next(years.dec.fri[-1](before='2024-05-17', descending=True)) == date(2023, 12, 29)
+
+
+def test_as_of():
+    with as_of('2024-05-17'):
+        assert next(years.mar.weeks[-1].sun()) == date(2025, 4, 6)
+        assert next(months.end(descending=True)) == date(2024, 4, 30)
+        # explicit bounds take precedence over the anchor
+        assert next(days(after='2020-01-01')) == date(2020, 1, 1)
+    assert next(years.mar.weeks[-1].sun()) == date(1, 4, 1)
+
+
+def test_bound_pushdown():
+    class RecordingDGen(EveryDayDGen):
+        def __invoke__(self, start=date.min, end=date.max, after=date.min, before=date.max, calendar=None):
+            bounds.append((after, before))
+            yield from super().__invoke__(start, end, after, before, calendar)
+
+    bounds = []
+    c = ('2024-01-01' <= weeks.fri < '2024-03-01') & RecordingDGen()
+    assert next(c()) == date(2024, 1, 5)
+    assert bounds == [(date(2024, 1, 1), date(2024, 3, 1))]
+
+    bounds = []
+    c = ('2024-01-01' < months.end) - WeekendsDGen(RecordingDGen() + '1d')
+    assert next(c()) == date(2024, 1, 31)
+    assert bounds == [(date(2024, 1, 2), date.max)]
+
+    # a slice counts from the first date it generates, so no bounds are pushed into it
+    bounds = []
+    c = ('2024-01-01' <= days) & RecordingDGen()[5:]
+    assert next(c(after='2023-12-01', before='2024-02-01')) == date(2024, 1, 1)
+    assert bounds == [(date(2023, 12, 1), date(2024, 2, 1))]
+
+
+@pytest.mark.parametrize('dgen', [
+        days, weeks, weekdays, weekends, business_days, months.end, years.dec.fri[-1], months.days[3:10],
+        months.weekdays[-2:], months.wed[1], days[5:20], months + '1b', months.end - '2b', months + '1m',
+        weekdays + '-1b', roll_fwd(months), roll_bwd(months.end), months | weeks.fri, weekdays & months,
+        days - weekends, (months.days[1:5] | (weeks - '1d')) & weekdays, months.weekdays, months.weekends[1],
+        SubSequenceDGen(weeks, weekdays)[-1], years.weekends[::50],
+])
+@pytest.mark.parametrize('calendar', [
+        WeekendCalendar(),
+        WeekendCalendar((4, 5)),
+        HolidayCalendar((date(2024, 1, 1), date(2024, 12, 25))),
+])
+def test_to_numpy(dgen, calendar):
+    np = pytest.importorskip('numpy')
+
+    for after, before in [('2023-11-15', '2025-02-03'), ('2024-03-31', '2024-04-01'), ('2024-05-01', '2024-03-01')]:
+        expected = np.array(list(dgen(after=after, before=before, calendar=calendar)), dtype='datetime64[D]')
+        actual = dgen.to_numpy(after, before, calendar)
+        assert actual.dtype == expected.dtype
+        assert actual.tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize('dgen', [months + '1m', months.end + '1d', days + '1d', weeks - '1w', months.days])
+def test_to_numpy_out_of_range(dgen):
+    pytest.importorskip('numpy')
+
+    with pytest.raises(OverflowError):
+        dgen.to_numpy()
+    assert len(dgen.to_numpy('2000-01-01', '2001-01-01')) > 0
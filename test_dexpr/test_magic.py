@@ -1,10 +1,16 @@
 import inspect
+import itertools
+import pickle
+import sys
+import tracemalloc
 from dataclasses import dataclass
 
 import pytest
 
 from dexpr.magic import *
-from dexpr.magic import FailedOp, Expression
+from dexpr.magic import FailedOp, Expression, Op, calc_stream, compile, calc_batch, structural_key, Interner, interning, optimize, \
+    find_op, find_parameters, replace, GetattrOp, make_op, dumps, loads, calc_parallel, acalc, LRU, specialize, \
+    ReactiveExpression, build, parse
 
 
 @dataclass
@@ -116,6 +122,7 @@ _1 = ParameterOp(_index=1)
 def test_magic(expr, repr_, args, kwargs, res):
     assert repr(expr) == repr_
     assert calc(expr, *args, **kwargs) == res
+    assert compile(expr)(*args, **kwargs) == res
 
 
 @pytest.mark.xfail(raises=FailedOp)
@@ -130,6 +137,68 @@ def test_magic_errors(expr, args, kwargs):
     calc(expr, *args, **kwargs)
 
 
+class Failing:
+    # operators that report failure by returning a FailedOp
+    def __add__(self, other):
+        return FailedOp('cannot add')
+
+    def __neg__(self):
+        return FailedOp('cannot negate')
+
+    def __lt__(self, other):
+        return FailedOp('cannot compare')
+
+    def __gt__(self, other):
+        return True
+
+
+@pytest.mark.parametrize(
+    ('expr', 'args', 'kwargs'),
+    (
+            (_1, [0], {}),
+            (a, [], {}),
+            (_0.y, [A()], {}),
+            (_0 + _1.x, [1], {}),
+            ((_0 + 1) * 2, [Failing()], {}),
+            (-_0, [Failing()], {}),
+            (0 < _0 < 5, [Failing()], {}),
+    )
+)
+def test_compile_errors(expr, args, kwargs):
+    r = calc(expr, *args, raise_=False, **kwargs)
+    assert isinstance(r, FailedOp)
+    assert repr(compile(expr)(*args, raise_=False, **kwargs)) == repr(r)
+    with pytest.raises(FailedOp):
+        compile(expr)(*args, **kwargs)
+
+
+def test_compile():
+    def f(x, y=0):
+        return x - y
+
+    expr = lazy(f)(_0, y=_1.x) + [_0, {'a': _1.x}][1]['a']
+    assert calc(expr, 5, A(2)) == compile(expr)(5, A(2)) == 5
+
+    expr = [lazy(str)(i) for i in lazy(range)(_0)]
+    assert compile(expr)(3) == calc(expr, 3) == ['0', '1', '2']
+
+    expr = Expression(a.f(_1) * 2, compiled=True)
+    assert expr(A(), 2) == 6
+
+    calls = []
+
+    def record(x):
+        calls.append(x)
+        return x
+
+    expr = lazy(record)(1) < lazy(record)(2) < lazy(record)(3)
+    assert calc(expr) is True and calls == [1, 2, 3]
+    calls.clear()
+    assert compile(expr)() is True and calls == [1, 2, 3]
+    expr = _0.z < _0.y < 1  # the failure of the left hand side is the one reported
+    assert repr(compile(expr)(A(), raise_=False)) == repr(calc(expr, A(), raise_=False))
+
+
 def test_magic_list_comprehension():
     str_ = lazy(str)
 
@@ -145,6 +214,14 @@ def test_magic_list_comprehension():
     expr = [str_(i) + str_(k) for i in _0 for j in _1 for k in j]
     assert calc(expr, [0, 1], [[0], [1]]) == ['00', '01', '10', '11']
 
+    # the item can use the arguments, and keyword arguments do not clash with the iterators
+    k = ParameterOp(_name='k')
+    expr = lazy([i * _1 + j + k for i in lazy(range)(_0) for j in lazy(range)(i)])
+    assert calc(expr, 3, 10, k=1, i=7) == [11, 21, 22]
+    plan = expr._plan()
+    assert calc(expr, 2, 1, k=0) == [1]
+    assert expr._plan() is plan
+
 
 def test_magic_dict_comprehension():
     expr = {k: i for i in _0 for k in i}
@@ -176,3 +253,601 @@ def test_expression():
     assert s.parameters['key'].name == 'key'
     assert s.parameters['key'].kind == inspect.Parameter.KEYWORD_ONLY
     assert expr1(key=1) == 2
+
+
+def test_calc_batch():
+    np = pytest.importorskip('numpy')
+
+    price, qty = [1.5, 2.0, 3.0, 4.0], np.array([1, 2, 3, 4])
+    expr = _0 * _1 + 1
+    assert calc_batch(expr, [price, qty]).tolist() == [calc(expr, p, q) for p, q in zip(price, qty)]
+
+    expr = 2 < _0 * _1 <= 9
+    assert calc_batch(expr, [price, qty]).tolist() == [False, True, True, False]
+
+    expr = lazy(max)(_0, _1) - a.x
+    assert calc_batch(expr, {0: price, 1: qty, 'a': [A(1), A(2), A(3), A(4)]}).tolist() == [0.5, 0.0, 0.0, 0.0]
+
+    expr = [i * 2 for i in lazy(range)(_0)]
+    assert calc_batch(expr, [[1, 2]]).tolist() == [[0], [0, 2]]
+
+    assert calc_batch(_0 + 1, [[]]).tolist() == []
+    assert calc_batch(const(1), [[1, 2]]).tolist() == [1, 1]
+
+    with pytest.raises(FailedOp):
+        calc_batch(_0 + _1, [price])
+    with pytest.raises(ValueError):
+        calc_batch(_0 + _1, [price, [1]])
+
+
+def test_structural_key():
+    assert structural_key(_0 + _1 * 2) == structural_key(_0 + _1 * 2)
+    # built outside of the asserts, pytest rewrites chained comparisons in them
+    c1, c2, c3 = 1 < _0 <= 3, 1 < _0 <= 3, 1 < _0 < 3
+    assert structural_key(c1) == structural_key(c2)
+    assert structural_key(a.f(_1, y=(1, 2))) == structural_key(a.f(_1, y=(1, 2)))
+    assert structural_key([i + 1 for i in _0]) == structural_key([j + 1 for j in _0])
+
+    assert structural_key(_0 + _1) != structural_key(_1 + _0)
+    assert structural_key(_0 + 1) != structural_key(_0 + 1.0)
+    assert structural_key(c3) != structural_key(c1)
+    assert structural_key([i + j for i in _0 for j in _0]) != structural_key([i + i for i in _0 for j in _0])
+
+    cache = LRU()
+    assert structural_key(pure(abs, cache=cache)(_0)) == structural_key(pure(abs, cache=cache)(_0))
+    assert structural_key(pure(abs)(_0)) != structural_key(pure(abs, cache=cache)(_0))
+    assert structural_key(pure(abs, cache=LRU())(_0)) != structural_key(pure(abs, cache=cache)(_0))
+
+
+def test_interning():
+    interner = Interner()
+    e1 = interner((_0.x + 1) * (_0.x + 1))
+    e2 = interner(_0.x + 1)
+    assert e1._lhs is e1._rhs is e2
+    assert calc(e1, A(2)) == 9
+
+    expr = [i + j for i in _0 for j in _0]
+    assert calc(interner(expr), [1, 2]) == calc(expr, [1, 2]) == [2, 3, 3, 4]
+
+    with interning() as interner:
+        e1 = 1 < _0.x + _1 < 3
+        e2 = _0.x + _1
+        e3 = a.f(_1)
+    assert e1._obj is e2
+    assert calc(e1, A(1), 1) and not calc(e1, A(1), 2)
+    assert e3 is interner(a.f(_1))
+
+
+def test_optimize():
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x + 1
+
+    f_ = lazy(f)
+    assert repr(optimize(f_(3) + 2 * 5)) == repr(f_(3) + 10)
+
+    expr = optimize(pure(f)(3) + 2 * 5 + _0)
+    assert repr(expr) == '14 + _0'
+    assert calls == [3]
+    assert calc(expr, 1) == 15
+    assert calls == [3]
+
+    assert repr(optimize((_0 + 0) * 1 - (0 + -(-_1)) * (1 * a.x))) == '_0 - _1 * a.x'
+    assert repr(optimize(_0 * 1.0 + _1 / 1)) == '_0 * 1.0 + _1 / 1'
+
+    assert repr(optimize(pure(f)(_0) + pure(f)(1 + 1))) == repr(f_(_0) + 3)
+    assert repr(optimize([i * 1 + 2 * 3 for i in _0])) == '[i + 6 for i in iter(_0)]'
+    assert repr(optimize(pure(list)([1, 2]))) == 'list([1, 2])'
+    assert repr(optimize(pure(f)('x'))) == repr(f_('x'))
+
+    expr = Expression(_0 + 2 * 3, optimized=True)
+    assert repr(expr) == '_0 + 6'
+    assert expr(1) == 7
+
+
+def test_shared_subexpressions():
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x
+
+    s = lazy(f)(_0.x * _1)
+    expr = s + s * 2
+    for _ in range(20):
+        expr = expr + expr
+    assert calc(expr, A(2), 3) == 18 * 2 ** 20
+    assert calls == [6]
+
+    calls.clear()
+    assert compile(expr)(A(2), 3) == 18 * 2 ** 20
+    assert calls == [6]
+
+    # shared nodes are walked once, not once per path to them
+    assert find_parameters(expr) == (_0, _1)
+    assert list(inspect.signature(Expression(expr)).parameters) == ['i0', 'i1']
+
+    calls.clear()
+    chain = 0 < s < 10
+    assert calc(chain, A(2), 3) is True
+    assert calls == [6]
+
+
+def test_deep_expressions():
+    n = 5000
+    expr = _0
+    for i in range(n):
+        expr = expr + _1
+    assert calc(expr, 1, 2) == 1 + 2 * n
+    assert repr(expr) == ' + '.join(['_0'] + ['_1'] * n)
+    tracemalloc.start()
+    repr(expr)
+    assert tracemalloc.get_traced_memory()[1] < 5_000_000  # the operand strings are not all kept
+    tracemalloc.stop()
+    assert find_parameters(expr) == (_0, _1)
+    assert find_op(expr, GetattrOp) is False
+    assert calc(replace(expr, {_0: a.x}), A(3), 2) == 3 + 2 * n
+    assert compile(expr)(1, 2) == Expression(expr, compiled=True)(1, 2) == 1 + 2 * n
+    assert list(calc_stream(expr, [(1, 2), (2, 1)])) == [1 + 2 * n, 2 + n]
+
+    cond = _0
+    for i in range(n):
+        cond = lazy(max)(cond, -_1)
+    assert calc([cond, cond], 1, 2) == [1, 1]
+    assert calc(optimize(cond), 1, 2) == 1
+    assert compile([cond, if_(_0 > 0, cond, _0.y)])(1, 2) == [1, 1]
+    assert isinstance(compile(cond + expr)(1, raise_=False), FailedOp)
+
+    def deep(x):
+        for _ in range(n):
+            x = x + 1
+        return x
+    assert len(structural_key([deep(i) for i in _0])) == 4
+    assert repr(make_op([deep(i) for i in _0])).endswith(' + 1 for i in iter(_0)]')
+
+
+def test_deep_batch():
+    np = pytest.importorskip('numpy')
+
+    expr = _0
+    for i in range(5000):
+        expr = expr * 1 + _1 if i % 2 else -(expr - _1)
+    assert calc_batch(expr, [[1, 2], np.array([3, 4])]).tolist() == [calc(expr, 1, 3), calc(expr, 2, 4)]
+
+
+def test_serialization():
+    import copy
+    import pickle
+
+    s = _0.x * _1
+    exprs = [a.f(_1) - 10, lazy(round)(_0.x, ndigits=_1) < 5, 0 < s <= s * 2, (s, [_1, {'k': s}]),
+             lazy(A)(x=_1).x, [i * 2 for i in lazy(range)(3)], {i: -i for i in lazy(range)(_1)}]
+    for expr in exprs:
+        for loaded in (loads(dumps(expr)), pickle.loads(pickle.dumps(make_op(expr))),
+                       copy.deepcopy(make_op(expr))):
+            assert repr(loaded) == repr(make_op(expr))
+            assert calc(loaded, A(2), 3) == calc(expr, A(2), 3)
+
+    loaded = loads(dumps(s + s))
+    assert loaded._lhs is loaded._rhs
+    assert copy.copy(s) is s
+
+    with pytest.raises(ValueError):
+        loads(b'dexpr\x63' + dumps(s)[6:])
+    with pytest.raises(pickle.PicklingError):
+        dumps(lazy(lambda x: x)(_0))
+
+
+def test_calc_parallel():
+    expr = lazy(pow)(_0, 2) + ParameterOp(_index=1, _name='y')
+    items = [(i, 1) for i in range(100)] + [{'y': 1}, ('x', 1)]
+
+    results = list(calc_parallel(expr, items, workers=2, chunksize=7))
+    assert results[:100] == [i * i + 1 for i in range(100)]
+    assert [type(r) for r in results[100:]] == [FailedOp, FailedOp]
+    assert isinstance(results[-1]._cause, TypeError)
+
+    results = list(calc_parallel(expr, iter(items[:100]), workers=2, chunksize=7, ordered=False))
+    assert sorted(results) == list(enumerate(i * i + 1 for i in range(100)))
+
+    assert list(calc_parallel(_0 * 2, [1, 2, 3], workers=1)) == [2, 4, 6]
+
+    # a result that cannot be sent back fails alone
+    import threading
+    results = list(calc_parallel(if_(_0 == 2, lazy(threading.Lock)(), _0), [1, 2, 3], workers=1))
+    assert results[0] == 1 and isinstance(results[1], FailedOp) and results[2] == 3
+
+    assert list(calc_parallel(_0['k'], [{'k': 1}, {'k': 2}], workers=1, unpack=False)) == [1, 2]
+    assert list(calc_parallel(lazy(len)(_0), [(1, 2), 'abc'], workers=1, unpack=False)) == [2, 3]
+
+    # errors are raised when called, before any result is asked for
+    with pytest.raises(pickle.PicklingError):
+        calc_parallel(lazy(lambda x: x)(_0), [1])
+    with pytest.raises(ValueError):
+        calc_parallel(_0, [1], chunksize=0)
+    with pytest.raises(TypeError):
+        calc_parallel(_0, 1)
+
+    import time
+    start = time.monotonic()
+    results = calc_parallel(lazy(time.sleep)(_0), [0] + [0.2] * 40, workers=2, chunksize=1)
+    assert next(results) is None
+    results.close()  # the chunks not started are cancelled
+    assert time.monotonic() - start < 4
+
+
+def test_concurrent_evaluation():
+    from concurrent.futures import ThreadPoolExecutor
+    import time
+
+    def slow(x):
+        time.sleep(0)  # lets the other threads run in the middle of an evaluation
+        return x
+
+    comprehension = [lazy(slow)(i) * j for i in lazy(range)(_0) for j in lazy(range)(i)]
+    chain = _0 < lazy(slow)(_1) <= 10
+    reentrant = lazy(lambda n: calc(comprehension, n))(_0)
+
+    def check(n):
+        assert calc(comprehension, n % 7) == [i * j for i in range(n % 7) for j in range(i)]
+        assert compile(comprehension)(n % 5) == [i * j for i in range(n % 5) for j in range(i)]
+        assert calc(chain, n % 3, n % 12) == (n % 3 < n % 12 <= 10)
+        assert calc(reentrant, n % 4) == [i * j for i in range(n % 4) for j in range(i)]
+        return True
+
+    with ThreadPoolExecutor(8) as pool:
+        assert all(pool.map(check, range(2000)))
+
+
+def test_chained_comparison_scope():
+    from dexpr.magic import _pending_comparisons, _CHAIN_LINKS_DETECTED
+
+    # chains are told apart in the bytecode, an interpreter whose bytecode is not recognised needs support
+    assert _CHAIN_LINKS_DETECTED, f'chained comparisons are not detected on {sys.implementation.name} {sys.version}'
+
+    # a comparison tested outside of a chain is not kept for one to continue
+    for i in range(1000):
+        if (_0 + i) > 5:
+            pass
+    assert not _pending_comparisons()
+
+    # so a later comparison of its operand does not join it
+    x = _0 + 1
+    if not 0 < x:
+        pytest.fail()
+    c = x < 10
+    assert repr(c) == '_0 + 1 < 10'
+    assert calc(c, -5) is True
+
+
+def test_chained_comparison_fallback(monkeypatch):
+    # without the bytecode check every comparison tested for truth is recorded, chains still join
+    import dexpr.magic
+    monkeypatch.setattr(dexpr.magic, '_CHAIN_LINKS_DETECTED', False)
+    c = 0 < _0 < 10
+    assert repr(c) == '0 < _0 < 10' and calc(c, 5) is True and calc(c, 10) is False
+
+
+def test_acalc():
+    import asyncio
+
+    running, most = 0, 0
+
+    async def fetch(x):
+        nonlocal running, most
+        running += 1
+        most = max(most, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return x * 10
+
+    f = lazy(fetch)
+    s = f(_0)
+    assert asyncio.run(acalc(f(_0) + f(_1) * f(2), 1, 2)) == 10 + 20 * 20
+    assert most == 3
+
+    most = 0
+    assert asyncio.run(acalc(lazy(max)(f(_0), s, lazy(min)(s, f(3))), 1)) == 10
+    assert most == 3
+
+    most = 0
+    assert asyncio.run(acalc([f(i) for i in lazy(range)(_0)], 5)) == [0, 10, 20, 30, 40]
+    assert most == 5
+
+    assert asyncio.run(acalc(0 < f(_0) < 15, 1)) is True
+    assert asyncio.run(acalc(a.f(_1), A(), 2)) == 3
+    assert isinstance(asyncio.run(acalc(a.y, A(), raise_=False)), FailedOp)
+    with pytest.raises(FailedOp):
+        asyncio.run(acalc(f(_1), 1))
+
+
+def test_comprehension_filters():
+    sources = []
+
+    def source(i):
+        sources.append(i)
+        return range(i)
+
+    expr = lazy([where((i, j), (i % 2 == 0) & (j > 0)) for i in _0 for j in lazy(source)(i)])
+    assert repr(expr) == f'[(i, j) for i in iter(_0) for j in iter({source!r}(iter(_0))) if i % 2 == 0 if j > 0]'
+    assert calc(expr, range(6)) == [(2, 1), (4, 1), (4, 2), (4, 3)]
+    # the condition on i is tested before the source of j is evaluated
+    assert sources == [0, 2, 4]
+
+    expr = lazy({i: where(i * i, i > 1) for i in _0})
+    assert calc(expr, [1, 2, 3]) == {2: 4, 3: 9}
+
+    expr = lazy([where(where(i, i > 1), _1) for i in _0])
+    assert calc(expr, [1, 2, 3], True) == [2, 3]
+    assert calc(expr, [1, 2, 3], False) == []
+
+    assert calc(where(_0, _0 > 1), 2) == 2
+    assert isinstance(calc(where(_0, _0 > 1), 1, raise_=False), FailedOp)
+
+
+def test_generator_comprehension():
+    produced = []
+
+    def f(i):
+        produced.append(i)
+        return i * 2
+
+    expr = lazy(where(lazy(f)(i), i != 2) for i in _0)
+    assert repr(expr) == f'({f!r}(i) for i in iter(_0) if i != 2)'
+
+    gen = calc(expr, itertools.count())
+    assert next(gen) == 0 and next(gen) == 2 and next(gen) == 6
+    assert produced == [0, 1, 3]
+
+    loaded = loads(dumps(lazy(where(i * 2, i != 2) for i in _0)))
+    assert list(itertools.islice(calc(loaded, itertools.count()), 3)) == [0, 2, 6]
+
+    started = (i * 2 for i in _0)
+    next(started)
+    with pytest.raises(TypeError):
+        lazy(started)
+    list(started)
+    with pytest.raises(TypeError):
+        lazy(started)  # exhausted
+    assert calc(lazy(x for x in [1, 2])) is not None  # other generators are constants
+
+
+def test_lru_cache():
+    calls = []
+
+    def double(x):
+        calls.append(x)
+        return x * 2
+
+    cache = LRU(maxsize=2)
+    expr = pure(double, cache=cache)(_0) + 1
+    assert [calc(expr, x) for x in (1, 2, 1, 3, 1)] == [3, 5, 3, 7, 3]
+    assert calls == [1, 2, 3]
+    assert (cache.hits, cache.misses, cache.evictions, len(cache)) == (2, 3, 1, 2)
+
+    fn = compile(expr)
+    assert fn(3) == 7 and calls == [1, 2, 3]
+    copied = pickle.loads(pickle.dumps(cache))  # the cached results are not serialized
+    assert (copied.maxsize, len(copied)) == (2, 0)
+
+    expr = Expression(_0 / _1, cache=LRU())
+    assert expr(4, 2) == expr(4, 2) == 2
+    assert isinstance(expr(4, raise_=False), FailedOp)
+    assert (expr.cache.hits, expr.cache.misses) == (1, 2)
+    with pytest.raises(FailedOp):
+        expr(4)
+    assert expr.cache.hits == 2
+
+    expr = Expression(_0 * 2, cache=LRU())
+    assert expr([1]) == [1, 1] and len(expr.cache) == 0  # unhashable arguments bypass the cache
+    assert expr(3) == 6 and len(expr.cache) == 1
+
+    cache = LRU()
+    e1, e2 = Expression(_0 + 1, cache=cache), Expression(_0 * 100, cache=cache)
+    assert e1(2) == 3 and e2(2) == 200 and e1(2) == 3
+    assert Expression(_0 + 1, cache=cache)(2) == 3 and (cache.hits, len(cache)) == (2, 2)
+
+
+def test_specialize():
+    calls = []
+
+    def notional(product):
+        calls.append(product)
+        return product.x * 100
+
+    rate = ParameterOp(_name='rate')
+    expr = lazy(notional)(_0) * _1 + rate
+    residual = specialize(expr, A(x=2))
+    assert repr(residual) == '200 * _0 + rate'
+    assert [calc(residual, m, rate=1) for m in (1, 2, 3)] == [calc(expr, A(x=2), m, rate=1) for m in (1, 2, 3)]
+    assert len(calls) == 4  # once by specialize and once by each calc of expr
+
+    residual = specialize(expr, rate=5)
+    assert repr(residual).endswith('(_0) * _1 + 5') and calc(residual, A(), 2) == 205
+    assert calc(specialize(expr, A(), 2, rate=1)) == 201
+
+    comprehension = lazy([i * _0 for i in lazy(range)(_1)])
+    assert repr(specialize(comprehension, 2)) == '[i * 2 for i in iter(range(_0))]'
+    assert calc(specialize(comprehension, 2, 3)) == [0, 2, 4]
+    generator = specialize(lazy(i * _0 for i in lazy(range)(_1)), 2, 3)  # not folded, as it is consumed once
+    assert list(calc(generator)) == list(calc(generator)) == [0, 2, 4]
+
+    residual = specialize(_0.y + _1, A())  # failures are kept, to fail on evaluation
+    assert isinstance(calc(residual, 1, raise_=False), FailedOp)
+
+    residual = specialize(make_op([_0, [_0, 1]]), 2)  # mutable results are built on every call
+    calc(residual)[1].append(9)
+    assert calc(residual) == [2, [2, 1]]
+
+
+def test_reactive_expression():
+    calls = []
+
+    def traced(name):
+        def f(*args):
+            calls.append(name)
+            return sum(args)
+        return lazy(f)
+
+    spot = ParameterOp(_name='spot')
+    expr = traced('a')(_0, 1) * traced('b')(spot) + traced('c')(_1)
+    reactive = ReactiveExpression(expr, 1, 2, spot=3)
+    assert reactive.value() == calc(expr, 1, 2, spot=3) == 8
+    calls.clear()
+
+    assert reactive.update(spot=4) == 10 and calls == ['b']
+    assert reactive.update(1, 5) == 13 and calls == ['b', 'c']  # _0 is the same object, so only _1 changed
+    assert reactive.value() == 13 and calls == ['b', 'c']
+    reactive.set(0, 2)
+    assert reactive.value() == 17 and calls == ['b', 'c', 'a']
+
+    comprehension = ReactiveExpression([i * spot for i in lazy(range)(_0)], 3, spot=2)
+    assert comprehension.value() == [0, 2, 4]
+    assert comprehension.update(spot=3) == [0, 3, 6]
+    generator = ReactiveExpression(lazy(i * spot for i in lazy(range)(_0)), 3, spot=2)
+    assert list(generator.value()) == list(generator.value()) == [0, 2, 4]  # evaluated again for every value
+
+    with pytest.raises(FailedOp):
+        ReactiveExpression(_0 + _1, 1).value()
+
+
+def test_profiling():
+    expr = lazy(abs)(_0) * 2 + _1 / _0
+    invoke = Op.__invoke__
+    with profiling() as profile:
+        assert [calc(expr, x, 3) for x in (1, -1, 3)] == [5, -1, 7]
+        assert isinstance(calc(expr, 1, raise_=False), FailedOp)
+        with pytest.raises(ZeroDivisionError):
+            calc(expr, 0, 1)
+        assert calc([i * _0 for i in lazy(range)(_1)], 2, 3) == [0, 2, 4]
+    assert Op.__invoke__ is invoke
+    calc(expr, 1, 1)  # not recorded
+
+    stats = profile.as_dict()
+    assert (stats[repr(lazy(abs)(_0))]['count'], stats[repr(lazy(abs)(_0))]['failures']) == (5, 0)
+    assert (stats['_1 / _0']['count'], stats['_1 / _0']['failures']) == (5, 2)
+    assert stats[repr(expr)]['count'] == 4  # the evaluation raising is not recorded above the node raising
+    assert stats['#0 * _0']['count'] == 3  # comprehension items are evaluated with the iterators as parameters
+    assert all(s['cumulative'] >= s['self'] >= 0 for s in stats.values())
+
+    lines = profile.table(sort='count', limit=3).splitlines()
+    assert lines[0].split() == ['count', 'cumulative', 'self', 'failures', 'expression']
+    assert len(lines) == 4 and lines[1].endswith('  _0')
+
+
+def test_build():
+    for spec, expr in (
+            (('+', ('getattr', ('param', 0), 'x'), 1), _0.x + 1),
+            (('<', 0, ('param', 0), ('-', ('param', 1))), 0 < _0 < -_1),
+            (('>=', 1, ('param', 1)), 1 >= _1),
+            (('getitem', ('param', 'a', 0), ('abs', ('**', ('param', 1), 2))), a[abs(_1 ** 2)]),
+            (('call', ('param', 0), ('%', 7, ('param', 1))), _0(7 % _1)),
+            ({'op': 'call', 'args': ['max', ('param', 1), 3], 'kwargs': {'default': ('param', 'a', 0)}},
+             lazy(max)(_1, 3, default=a)),
+    ):
+        built = build(spec, functions={'max': max})
+        assert structural_key(built) == structural_key(expr) and repr(built) == repr(expr)
+
+    assert calc(build(('==', ('const', (1, 2)), ('param', 0))), (1, 2)) is True
+    assert calc(build(('-', 5))) == -5 and calc(build(('+', ('abs', -3), ('param', 0))), 1) == 4
+    assert calc(build(('where', 1, True))) == 1
+    x = ('*', ('param', 0), 2)
+    shared = build(('+', x, x))
+    assert shared._lhs is shared._rhs
+    assert repr(build(('if', ('and', ('param', 0), 1), 2, ('coalesce', ('param', 1), 5)))) == \
+        'if_(and_(_0, 1), 2, coalesce(_1, 5))'
+
+    spec = ('param', 0)
+    for _ in range(10000):
+        spec = ('+', spec, 1)
+    assert calc(build(spec), 0) == 10000
+
+    import json
+    rule = json.loads('{"op": "<=", "args": [["*", ["getattr", ["param", 0], "x"], ["param", "qty"]], 10]}')
+    assert repr(build(rule, lists=True)) == '_0.x * qty <= 10'
+    assert calc(build(['getitem', ['const', [1, 2]], ['param', 0]], lists=True), 1) == 2
+    assert calc(build(('getitem', [1, 2], ('param', 0))), 1) == 2  # otherwise lists are constants
+
+    with pytest.raises(ValueError):
+        build(('min', 1, 2))
+    with pytest.raises(ValueError):
+        build(('call', 'min', 1, 2))
+
+
+def test_parse():
+    _2, qty = ParameterOp(_index=2), ParameterOp(_name='qty')
+    for source, expr in (
+            ('_0.price * _1 + abs(_2)', _0.price * _1 + abs(_2)),
+            ('0 < _0 <= 10', 0 < _0 <= 10),
+            ('1 > _0', 1 > _0),
+            ('max(_0, qty, default=-1.5)', lazy(max)(_0, qty, default=-1.5)),
+            ('round(_0 / 3, 2) ** 2 % 4 // -_1', round(_0 / 3, 2) ** 2 % 4 // -_1),
+            ('(_0, [_1, 2], {"a": ~_0})', lazy((_0, [_1, 2], {"a": ~_0}))),
+    ):
+        parsed = parse(source, {'max': max})
+        assert structural_key(parsed) == structural_key(expr) and repr(parsed) == repr(expr)
+
+    assert calc(parse('_0[1:] + _0[-1:]'), [1, 2]) == [2, 2]
+    assert parse('_0 * 2 + _0') is parse('_0 * 2 + _0')
+    parsed = parse('_0 * 2 + _0')
+    assert parsed._lhs._lhs is parsed._rhs
+    assert calc(parse('f(_0)'), 2, f=str) == '2'  # unknown names are keyword parameters
+    assert calc(parse('abs(-3) + _0'), 1) == 4 and calc(parse('-(3) + ~1')) == -5
+
+    assert repr(parse('_0.a if _1 > 0 and _0 else _1 or 3')) == 'if_(and_(_1 > 0, _0), _0.a, or_(_1, 3))'
+
+    for source in ('not _0', '[i for i in _0]', 'lambda: 1', 'f(*_0)', '_0.__class__', '_0 in _1', '_0 is _1',
+                   '_0 not in _1', '0 < _0 in _1'):
+        with pytest.raises(ValueError):
+            parse(source)
+
+
+def test_short_circuit():
+    calls = []
+
+    def lookup(x):
+        calls.append(x)
+        return x * 10
+
+    lookup = lazy(lookup)
+    expr = if_(_0 > 0, lookup(_0), -1)
+    assert repr(expr) == f'if_(_0 > 0, {repr(lookup)}(_0), -1)'
+    fn = compile(expr)
+    assert [calc(expr, 2), calc(expr, -2), fn(3), fn(-3)] == [20, -1, 30, -1]
+    assert calls == [2, 3]
+
+    for flag, value in ((0, 0), ([], []), (2, 50)):
+        assert calc(and_(_0, lookup(_1)), flag, 5) == compile(and_(_0, lookup(_1)))(flag, 5) == value
+    for flag, value in ((0, 50), (7, 7)):
+        assert calc(or_(_0, lookup(_1)), flag, 5) == compile(or_(_0, lookup(_1)))(flag, 5) == value
+    assert calls == [2, 3, 5, 5, 5, 5]
+
+    assert calc(coalesce(_0.x, _1, 3), A(x=None), None) == compile(coalesce(_0.x, _1, 3))(A(x=None), None) == 3
+    assert calc(coalesce(_0.y, _1, 3), A(), 2) == 2  # failures are skipped
+    assert isinstance(calc(coalesce(_1, _0.y), A(), None, raise_=False), FailedOp)
+    assert isinstance(calc(and_(_0.y, lookup(1)), A(), raise_=False), FailedOp) and len(calls) == 6
+
+    assert repr(optimize(if_(True, _0, lookup(_0)))) == '_0'
+    assert calc(loads(dumps(if_(_0, or_(_1, 2), coalesce(None, 4)))), 0, 0) == 4
+
+
+def test_calc_stream():
+    expr = 10 // _0
+    for workers in (None, 3):
+        rows = itertools.chain([5, 0, 2], itertools.count(1))  # unbounded
+        stream = calc_stream(expr, rows, chunk=4, workers=workers)
+        results = list(itertools.islice(stream, 5))
+        assert results[0] == 2 and isinstance(results[1], FailedOp) and results[2:] == [5, 10, 5]
+        stream.close()
+        assert list(calc_stream(expr, [5, 0, 2], chunk=2, workers=workers, failed='skip')) == [2, 5]
+        with pytest.raises(FailedOp):
+            list(calc_stream(expr, [5, 0, 2], workers=workers, failed='raise'))
+
+    b = ParameterOp(_name='b')
+    assert list(calc_stream(_0 * 2, [(1, 2), [3], {'b': 1}], failed='skip')) == [2, [3, 3]]
+    assert list(calc_stream(b + 1, [{'b': 1}, (2,)], failed='skip')) == [2]
+    assert list(calc_stream(_0['b'], [{'b': 1}, {'b': 2}], unpack=False)) == [1, 2]
+    with pytest.raises(ValueError):
+        calc_stream(expr, [1], failed='ignore')